@@ -25,6 +25,14 @@ class Config(ConfigDict):
         "connect_args": {},  # 连接配置参数
         "autocommit": False,
         "autoflush": False,
+        # 连接池配置，同步与异步引擎各有一个连接池，
+        # 每个进程最多占用 2 × (pool_size + max_overflow) 个数据库连接
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),  # 常驻连接数
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),  # 高峰时额外连接数
+        "pool_timeout": 10,  # 取连接的最长等待时间（秒），超时报错而不是无限排队
+        "pool_pre_ping": True,  # 取连接时检测连接是否可用（数据库重启、连接被断开）
+        "pool_recycle": 1800,  # 连接最长使用时间（秒），应短于数据库或代理的空闲超时
+        "slow_checkout_ms": 100,  # 取连接耗时超过该值计为慢取连接
     }
 
     # JWT认证配置
@@ -38,10 +46,109 @@ class Config(ConfigDict):
     UPLOAD_CONFIG: Dict[str, Any] = {
         "upload_dir": Path("uploads"),
         "allowed_types": ["image/jpeg", "image/png", "image/jpg"],
+        "zip_types": ["application/zip", "application/x-zip-compressed"],
+        "max_batch_files": 32,  # 批量识别单次请求的最大图像数（含zip内图像）
+        "max_file_size": 20 * 1024 * 1024,  # 单张图像的最大字节数
+        "max_zip_size": 200 * 1024 * 1024,  # 批量识别上传的zip文件最大字节数
+        "max_image_pixels": 50_000_000,  # 图像头中声明的最大像素数（宽×高）
+        "max_request_size": 256 * 1024 * 1024,  # 请求体最大字节数（按Content-Length）
+    }
+
+    # 图像存储配置：按内容哈希寻址，相同内容只存储一份
+    STORAGE_CONFIG: Dict[str, Any] = {
+        "backend": os.environ.get("STORAGE_BACKEND", "local"),  # local / s3
+        # 本地存储根目录（位于上传目录中，签名URL与 X-Accel-Redirect 可直接访问）
+        "local_root": UPLOAD_CONFIG["upload_dir"] / "objects",
+        # S3 兼容存储，endpoint_url 可指向 MinIO 等本地替代服务
+        "s3_bucket": os.environ.get("S3_BUCKET", ""),
+        "s3_prefix": os.environ.get("S3_PREFIX", ""),
+        "s3_endpoint_url": os.environ.get("S3_ENDPOINT_URL"),
+        "s3_region": os.environ.get("S3_REGION"),
+        # S3 对象的本地读取缓存（解码、Grad-CAM 与缩略图需要本地文件）
+        "s3_cache_dir": UPLOAD_CONFIG["upload_dir"] / "cache",
+    }
+
+    # 媒体文件签名URL配置
+    MEDIA_CONFIG: Dict[str, Any] = {
+        # 签名密钥，未设置时使用JWT密钥
+        "signing_key": os.environ.get("MEDIA_SIGNING_KEY")
+        or os.environ.get("JWT_SECRET_KEY", "114514"),
+        "url_ttl_s": 3600,  # 签名URL有效期（秒），实际有效期在1~2倍之间
+        # 文件发送方式：python（由应用发送）/ x-accel-redirect（nginx）/ x-sendfile（Apache等）
+        "delivery": os.environ.get("MEDIA_DELIVERY", "python"),
+        # x-accel-redirect 模式下 nginx 中映射到上传目录的 internal location
+        "accel_prefix": os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-uploads/"),
+    }
+
+    # 缩略图配置：识别后在后台生成，图像接口通过 size 参数获取
+    THUMBNAIL_CONFIG: Dict[str, Any] = {
+        "sizes": [128, 256, 512],  # 长边像素数
+        "formats": ["webp", "jpeg"],
+        "quality": 80,  # WebP / JPEG 编码质量
+        "workers": 1,  # 后台生成缩略图的线程数
+    }
+
+    # 入库重压缩配置：上传的原图由后台任务缩小并重新编码后替换存储中的原图
+    RECOMPRESS_CONFIG: Dict[str, Any] = {
+        "enabled": os.environ.get("RECOMPRESS_UPLOADS", "false").lower() == "true",
+        "max_side": 2048,  # 存储图像长边像素上限，远大于模型输入的224像素
+        "format": "webp",  # webp / jpeg
+        "quality": 90,  # 编码质量
+        "min_savings_ratio": 0.1,  # 至少节省该比例的字节时才替换原图
     }
 
     # 识别配置
-    IDENTIFICATION_CONFIG: Dict[str, Any] = {"default_threshold": 0.1}
+    IDENTIFICATION_CONFIG: Dict[str, Any] = {
+        "default_threshold": 0.1,
+        # 动态批处理配置
+        "max_batch_size": 16,  # 单次前向推理的最大批大小
+        "max_wait_ms": 10,  # 收集批次的最长等待时间（毫秒）
+        "max_queue_size": 256,  # 等待推理的最大请求数，超过则拒绝
+        # 准入控制：限制同时预处理与推理的请求数，超出的按用户轮询排队
+        "max_concurrency": 32,  # 同时处理的识别请求数
+        "admission_queue_size": 128,  # 等待准入的最大请求数，超过则返回503
+        "max_estimated_wait_s": 10,  # 预计等待时间上限（秒），超过则返回503
+        # 图像解码与预处理线程数
+        "preprocess_threads": int(os.environ.get("PREPROCESS_THREADS", 4)),
+        # 推理引擎：keras / savedmodel / tflite_fp16 / tflite_int8
+        "engine": os.environ.get("INFERENCE_ENGINE", "keras"),
+        # 推理模式："thread" 在API进程内推理，"process" 使用多进程工作池
+        "inference_mode": os.environ.get("INFERENCE_MODE", "thread"),
+        "process_workers": 2,  # 多进程模式下的工作进程数
+        # API进程（线程模式）或每个工作进程（多进程模式）的TF线程数，0为TF默认（按CPU核数）
+        "tf_intra_op_threads": int(os.environ.get("TF_INTRA_OP_THREADS", 0)),
+        "tf_inter_op_threads": int(os.environ.get("TF_INTER_OP_THREADS", 0)),
+        # 图像预处理配置
+        "reduced_decode": True,  # 按JPEG头部尺寸选择1/2、1/4、1/8降采样解码
+        "fundus_crop": True,  # 缩放前裁剪到眼底圆形区域，去掉黑色边框
+        "fundus_crop_threshold": 10,  # 判定为黑色边框的灰度上限
+    }
+
+    # Grad-CAM 配置
+    GRADCAM_CONFIG: Dict[str, Any] = {
+        "workers": 1,  # Grad-CAM 专用线程数，与识别推理线程分开
+        "max_pending": 16,  # 等待与执行中的 Grad-CAM 请求上限，超过则返回503
+    }
+
+    # 后台任务配置
+    JOBS_CONFIG: Dict[str, Any] = {
+        "workers": 2,  # 每个进程的任务工作者数量
+        "poll_interval_s": 0.5,  # 队列为空时的轮询间隔（秒）
+        "max_long_poll_s": 30,  # 查询任务状态时的最长等待时间（秒）
+        "stale_after_s": 600,  # 执行中的任务超过该时间视为工作者已退出，重新排队
+        "max_attempts": 3,  # 任务最多执行次数
+        "result_ttl_hours": 24,  # 已结束任务及其结果文件的保留时间（小时）
+    }
+
+    # 缓存配置
+    CACHE_CONFIG: Dict[str, Any] = {
+        "result_memory_entries": 1024,  # 识别结果进程内LRU条目上限
+        "result_db_entries": 100000,  # 识别结果数据库缓存条目上限
+        "heatmap_memory_bytes": 64 * 1024 * 1024,  # Grad-CAM热力图进程内LRU字节预算
+        "image_file_entries": 10000,  # 图像文件信息（路径、ETag）进程内LRU条目上限
+        # 图像接口的缓存策略：存储的图像不会改变，允许浏览器长期缓存
+        "image_cache_control": "private, max-age=31536000, immutable",
+    }
 
     # 密码哈希配置
     PASSWORD_CONFIG: Dict[str, Any] = {"schemes": ["bcrypt"], "deprecated": "auto"}
@@ -50,6 +157,22 @@ class Config(ConfigDict):
     def get_db_url(cls) -> str:
         return cls.DATABASE_CONFIG["url"]
 
+    @classmethod
+    def get_async_db_url(cls) -> str:
+        """
+        异步引擎的数据库URL
+
+        psycopg 3 同时提供同步与异步驱动，postgresql+psycopg 原样使用；
+        未指定驱动的 postgresql 改用 psycopg，SQLite 改用 aiosqlite
+        （仅用于开发环境，需要安装: uv sync --extra dev）
+        """
+        url = cls.get_db_url()
+        if url.startswith("postgresql://"):
+            return "postgresql+psycopg://" + url[len("postgresql://") :]
+        if url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + url[len("sqlite://") :]
+        return url
+
     @classmethod
     def get_db_connect_args(cls) -> Dict[str, Any]:
         return cls.DATABASE_CONFIG["connect_args"]
@@ -74,6 +197,18 @@ class Config(ConfigDict):
     def get_allowed_types(cls) -> list:
         return cls.UPLOAD_CONFIG["allowed_types"]
 
+    @classmethod
+    def get_max_batch_files(cls) -> int:
+        return cls.UPLOAD_CONFIG["max_batch_files"]
+
+    @classmethod
+    def get_max_file_size(cls) -> int:
+        return cls.UPLOAD_CONFIG["max_file_size"]
+
+    @classmethod
+    def get_max_image_pixels(cls) -> int:
+        return cls.UPLOAD_CONFIG["max_image_pixels"]
+
     @classmethod
     def get_password_config(cls) -> Dict[str, Any]:
         return cls.PASSWORD_CONFIG
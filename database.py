@@ -1,25 +1,144 @@
+import math
+import threading
+import time
+from collections import deque
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from Config import Config
 
+_db_config = Config.DATABASE_CONFIG
+
+
+class PoolWaitStats:
+    """
+    连接池取连接的耗时统计
+
+    耗时包括等待其他会话归还连接、新建连接与 pre-ping。
+    耗时持续偏高或出现超时，说明连接池过小或连接被长时间占用。
+    """
+
+    def __init__(self, slow_threshold_ms: float = 100, window: int = 1024):
+        """
+        :param slow_threshold_ms: 取连接耗时超过该值计为慢取连接（毫秒）
+        :param window: 计算分位数所用的最近样本数
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+
+    def record(self, wait_s: float, timed_out: bool = False) -> None:
+        wait_ms = wait_s * 1000
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self._total_ms += wait_ms
+            self._max_ms = max(self._max_ms, wait_ms)
+            if wait_ms > self.slow_threshold_ms:
+                self.slow_checkouts += 1
+            self._recent.append(wait_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            recent = sorted(self._recent)
+        p95 = recent[max(0, math.ceil(len(recent) * 0.95) - 1)] if recent else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "avg_wait_ms": (
+                round(self._total_ms / self.checkouts, 3) if self.checkouts else 0.0
+            ),
+            "recent_p95_wait_ms": round(p95, 3),
+            "max_wait_ms": round(self._max_ms, 3),
+            "slow_checkouts": self.slow_checkouts,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "timeouts": self.timeouts,
+        }
+
+
+class _TimedCheckoutMixin:
+    """在 Pool.connect() 外计时，记录每次取连接的耗时与超时"""
+
+    wait_stats: PoolWaitStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+# 统计放在类属性上：连接池被 dispose() 重建时统计不会丢失
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """同步引擎的连接池"""
+
+    wait_stats = PoolWaitStats(_db_config["slow_checkout_ms"])
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """异步引擎的连接池"""
+
+    wait_stats = PoolWaitStats(_db_config["slow_checkout_ms"])
+
+
+# 两个引擎使用相同的连接池配置
+_pool_args = {
+    "pool_size": _db_config["pool_size"],
+    "max_overflow": _db_config["max_overflow"],
+    "pool_timeout": _db_config["pool_timeout"],
+    "pool_pre_ping": _db_config["pool_pre_ping"],
+    "pool_recycle": _db_config["pool_recycle"],
+}
+
 # 使用配置类获取数据库URL
 SQLALCHEMY_DATABASE_URL = Config.get_db_url()
 
-# 创建引擎
+# 创建引擎（同步）：用于同步路由、后台线程与命令行工具
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args=Config.get_db_connect_args(),
+    poolclass=TimedQueuePool,
+    **_pool_args,
 )
 
 # 创建SessionLocal类
 SessionLocal = sessionmaker(
-    autocommit=Config.DATABASE_CONFIG["autocommit"],
-    autoflush=Config.DATABASE_CONFIG["autoflush"],
+    autocommit=_db_config["autocommit"],
+    autoflush=_db_config["autoflush"],
     bind=engine,
 )
 
+# 创建异步引擎：用于 async 路由与任务工作者，数据库I/O不阻塞事件循环
+async_engine = create_async_engine(
+    Config.get_async_db_url(),
+    connect_args=Config.get_db_connect_args(),
+    poolclass=TimedAsyncQueuePool,
+    **_pool_args,
+)
+
+# 创建AsyncSessionLocal类；提交后不使对象过期，避免访问属性时隐式查询
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=_db_config["autoflush"],
+    expire_on_commit=False,
+)
+
 # 创建Base类，用于创建模型类
 Base = declarative_base()
 
@@ -28,7 +147,11 @@ Base = declarative_base()
 def init_db():
     # 导入所有模型，确保它们已注册到Base中
     from models.EyeIdentification import EyeIdentification  # noqa: F401
+    from models.GradcamHeatmap import GradcamHeatmap  # noqa: F401
+    from models.IdentificationCache import IdentificationCache  # noqa: F401
     from models.IdentifySuggestions import IdentifySuggestions  # noqa: F401
+    from models.Job import Job  # noqa: F401
+    from models.StoredObject import StoredObject  # noqa: F401
     from models.UserRating import UserRating  # noqa: F401
     from models.Users import Users  # noqa: F401
 
@@ -43,3 +166,29 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# 异步数据库依赖项，用于 async 路由
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _describe_pool(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool 的 overflow() 在连接数未达到 pool_size 时为负数
+        "overflow": max(0, pool.overflow()),
+        "max_overflow": _db_config["max_overflow"],
+        **type(pool).wait_stats.stats(),
+    }
+
+
+def get_pool_stats() -> dict:
+    """同步与异步引擎的连接池占用与取连接耗时统计"""
+    return {
+        "async": _describe_pool(async_engine.sync_engine.pool),
+        "sync": _describe_pool(engine.pool),
+    }
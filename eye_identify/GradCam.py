@@ -1,22 +1,48 @@
-from pathlib import Path
+import asyncio
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
-import matplotlib.pyplot as plt
 import numpy as np
-import tensorflow as tf
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from Config import Config
 
-def preprocess_image(image_path, target_size=(224, 224)):
+from .batcher import QueueFullError
+from .gradcam_engine import get_gradcam_engine
+from .heatmap_cache import heatmap_cache, quantize_heatmap
+from .identify import get_preprocess_tag
+from .image_io import ImageSource, read_fundus_image
+from .labels import label_names
+from .model_registry import model_registry
+
+_gradcam_config = Config.GRADCAM_CONFIG
+
+# Grad-CAM 专用线程池：与识别推理分开，热力图计算不会占满识别所用的线程
+_gradcam_pool = ThreadPoolExecutor(
+    max_workers=_gradcam_config["workers"], thread_name_prefix="gradcam"
+)
+# 已提交但尚未完成的 Grad-CAM 请求数（只在事件循环线程中修改）
+_gradcam_pending = 0
+
+
+def preprocess_image(image: ImageSource, target_size=(224, 224)):
     """
     读取图像并进行预处理：
-      - 读取并转换为RGB
+      - 读取（文件路径或内存字节），按配置降采样解码并裁剪眼底区域，转换为RGB
       - 缩放到指定尺寸
       - 归一化到[0, 1]
     返回: shape为 (224, 224, 3) 的numpy数组，取值范围[0,1]
     """
-    img_bgr = cv2.imread(image_path)
-    if img_bgr is None:
-        raise FileNotFoundError(f"无法读取图像文件: {image_path}")
+    config = Config.IDENTIFICATION_CONFIG
+    img_bgr = read_fundus_image(
+        image,
+        min(target_size),
+        reduced_decode=config["reduced_decode"],
+        crop=config["fundus_crop"],
+        crop_threshold=config["fundus_crop_threshold"],
+    )
 
     img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
     img_rgb = cv2.resize(img_rgb, target_size)
@@ -24,69 +50,37 @@ def preprocess_image(image_path, target_size=(224, 224)):
     return img_rgb
 
 
-def get_gradcam_heatmap(img_array, model, last_conv_layer_name, pred_index=None):
+def get_gradcam_heatmap(
+    img_array, last_conv_layer_name="mixed10", pred_index=None, model_path=None
+):
     """
     计算指定输入图像的 Grad-CAM 热力图
     参数：
       img_array: 预处理后的图像，形状 (1, H, W, 3)
-      model: 已训练的 Sequential 模型，其中第一个层为嵌入的 InceptionV3
-      last_conv_layer_name: 目标卷积层名称（例如 'mixed10'）
+      last_conv_layer_name: 目标卷积层名称（例如 'mixed7' ... 'mixed10'）
       pred_index: 可选，指定计算哪个类别的热力图（默认取预测得分最高的类别）
+      model_path: 模型文件路径，如果为None则使用默认模型
     返回：
-      heatmap: 归一化后的热力图，范围 [0,1]
+      heatmap: 归一化后的热力图，范围 [0,1]，尺寸为目标层的空间分辨率
     """
-    # 获取嵌入的 InceptionV3 模型
-    inception = model.layers[0]
-
-    # 使用 GradientTape 手动构造前向传播
-    with tf.GradientTape() as tape:
-        # 计算 InceptionV3 部分的输出（即所有卷积特征）
-        conv_outputs = inception(img_array)
-        tape.watch(conv_outputs)
-
-        # 手动将 conv_outputs 传递给后续层，构造完整的前向传播
-        x = conv_outputs
-        for layer in model.layers[1:]:
-            x = layer(x)
-        predictions = x
+    # 每个 (模型版本, 目标层) 只构建并编译一次
+    engine = get_gradcam_engine(last_conv_layer_name, model_path=model_path)
+    return engine.heatmap(img_array, pred_index)
 
-        if pred_index is None:
-            pred_index = tf.argmax(predictions[0])
-        class_channel = predictions[:, pred_index]
 
-    # 计算梯度：目标类别相对于 conv_outputs 的梯度
-    grads = tape.gradient(class_channel, conv_outputs)
-    if grads is None:
-        raise ValueError("梯度计算失败，请检查模型结构和梯度带监控设置。")
-
-    pooled_grads = tf.reduce_mean(grads, axis=(0, 1, 2))
-
-    conv_outputs = conv_outputs[0]
-    heatmap = conv_outputs * pooled_grads
-    heatmap = tf.reduce_sum(heatmap, axis=-1)
-
-    # ReLU 截断负值并归一化
-    heatmap = tf.maximum(heatmap, 0)
-    max_val = tf.reduce_max(heatmap)
-    if max_val == 0:
-        return heatmap.numpy()
-    heatmap /= max_val
-    return heatmap.numpy()
-
-
-def generate_gradcam_on_image(img_array, model, last_conv_layer_name, alpha=0.4):
+def overlay_heatmap(img_array, heatmap, alpha=0.4):
     """
     参数：
       img_array: 形状为 (1, 224, 224, 3) 的预处理图像，归一化到 [0,1]
-      model: 已训练的模型
-      last_conv_layer_name: 目标卷积层名称，如 'mixed10'
+      heatmap: 归一化到 [0,1] 的热力图，或量化后的 uint8 热力图
       alpha: 叠加热力图时的透明度
     返回：
       叠加后的 BGR 图像（uint8）
     """
-    heatmap = get_gradcam_heatmap(img_array, model, last_conv_layer_name)
-    heatmap_resized = cv2.resize(heatmap, (224, 224))
-    heatmap_resized = np.uint8(255 * heatmap_resized)
+    if heatmap.dtype == np.uint8:
+        heatmap_resized = cv2.resize(heatmap, (224, 224))
+    else:
+        heatmap_resized = np.uint8(255 * cv2.resize(heatmap, (224, 224)))
     heatmap_color = cv2.applyColorMap(heatmap_resized, cv2.COLORMAP_JET)
 
     # 原始图像：输入 img_array 的像素范围为 [0,1]，转换为 0-255 的 uint8 格式
@@ -95,42 +89,274 @@ def generate_gradcam_on_image(img_array, model, last_conv_layer_name, alpha=0.4)
     return superimposed_img
 
 
+def generate_gradcam_on_image(
+    img_array, last_conv_layer_name="mixed10", alpha=0.4, model_path=None
+):
+    """
+    参数：
+      img_array: 形状为 (1, 224, 224, 3) 的预处理图像，归一化到 [0,1]
+      last_conv_layer_name: 目标卷积层名称，如 'mixed10'
+      alpha: 叠加热力图时的透明度
+      model_path: 模型文件路径，如果为None则使用默认模型
+    返回：
+      叠加后的 BGR 图像（uint8）
+    """
+    heatmap = get_gradcam_heatmap(
+        img_array, last_conv_layer_name, model_path=model_path
+    )
+    return overlay_heatmap(img_array, heatmap, alpha)
+
+
 def generate_gradcam(
-    image_path, model_path=None, last_conv_layer_name="mixed10", alpha=0.4
+    image_path: ImageSource,
+    model_path=None,
+    last_conv_layer_name="mixed10",
+    alpha=0.4,
 ):
     """
     为给定的图像生成 Grad-CAM 热力图
 
     参数：
-      image_path: 图像文件路径
-      model_path: 模型文件路径，如果为None则使用默认路径
+      image_path: 图像文件路径，或图像的原始字节
+      model_path: 模型文件路径，如果为None则使用默认模型
       last_conv_layer_name: 目标卷积层名称，默认为'mixed10'
       alpha: 热力图叠加透明度，默认0.4
 
     返回：
       gradcam_img_bgr: 叠加了热力图的BGR图像
     """
-    if model_path is None:
-        model_path = Path(__file__).parent / "model.h5"
-
-    # 加载模型
-    model = tf.keras.models.load_model(model_path)
-
     # 预处理图像
     img_rgb = preprocess_image(image_path, target_size=(224, 224))
     img_rgb_expanded = np.expand_dims(img_rgb, axis=0)  # (1,224,224,3)
 
-    # 生成 Grad-CAM 叠加图
+    # 生成 Grad-CAM 叠加图（模型从全局注册表获取，不再每次请求重新加载）
     gradcam_img_bgr = generate_gradcam_on_image(
-        img_rgb_expanded, model, last_conv_layer_name=last_conv_layer_name, alpha=alpha
+        img_rgb_expanded,
+        last_conv_layer_name=last_conv_layer_name,
+        alpha=alpha,
+        model_path=model_path,
     )
 
     return gradcam_img_bgr
 
 
+def generate_gradcam_jpeg(
+    image: ImageSource, last_conv_layer_name="mixed10", alpha=0.4
+) -> bytes:
+    """生成 Grad-CAM 叠加图并编码为 JPEG 字节"""
+    gradcam_img_bgr = generate_gradcam(
+        image, last_conv_layer_name=last_conv_layer_name, alpha=alpha
+    )
+    ok, img_encoded = cv2.imencode(".jpg", gradcam_img_bgr)
+    if not ok:
+        raise ValueError("Grad-CAM 图像编码失败")
+    return img_encoded.tobytes()
+
+
+def get_gradcam_model_version() -> str:
+    """Grad-CAM 所用模型（含预处理方式）的版本号，用于热力图缓存的键"""
+    return model_registry.version("default") + get_preprocess_tag()
+
+
+def compute_heatmap(
+    image: ImageSource, last_conv_layer_name="mixed10", class_index=None
+) -> tuple:
+    """
+    计算图像的 uint8 热力图（目标层分辨率）
+
+    返回: (heatmap, class_index)，未指定类别时 class_index 为预测得分最高的类别
+    """
+    img_array = np.expand_dims(preprocess_image(image), axis=0)
+    engine = get_gradcam_engine(last_conv_layer_name)
+    class_indices = None if class_index is None else [class_index]
+    heatmaps, predictions = engine.heatmaps(img_array, class_indices)
+    if class_index is None:
+        class_index = int(predictions[0].argmax())
+    return quantize_heatmap(heatmaps[0]), class_index
+
+
+def compute_class_heatmaps(
+    image: ImageSource, last_conv_layer_name="mixed10", class_indices=()
+) -> list:
+    """一次前向传播计算多个类别的 uint8 热力图，按 class_indices 顺序返回"""
+    img_array = np.expand_dims(preprocess_image(image), axis=0)
+    engine = get_gradcam_engine(last_conv_layer_name)
+    heatmaps, _ = engine.class_heatmaps(img_array, list(class_indices))
+    return [quantize_heatmap(heatmap) for heatmap in heatmaps]
+
+
+def blend_heatmaps_jpeg(image: ImageSource, heatmaps: list, alpha=0.4) -> list:
+    """将多张热力图分别叠加到同一图像上并编码为 JPEG，图像只解码一次"""
+    img_array = np.expand_dims(preprocess_image(image), axis=0)
+    images_jpeg = []
+    for heatmap in heatmaps:
+        ok, img_encoded = cv2.imencode(
+            ".jpg", overlay_heatmap(img_array, heatmap, alpha)
+        )
+        if not ok:
+            raise ValueError("Grad-CAM 图像编码失败")
+        images_jpeg.append(img_encoded.tobytes())
+    return images_jpeg
+
+
+def pack_gradcam_zip(class_indices, images_jpeg) -> bytes:
+    """将多个标签的叠加图打包为 zip，文件名为 类别索引_标签名.jpg"""
+    # JPEG已经压缩，zip中直接存储不再压缩
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for index, image_jpeg in zip(class_indices, images_jpeg):
+            label = label_names[index].replace("/", "_")
+            archive.writestr(f"{index:02d}_{label}.jpg", image_jpeg)
+    return buffer.getvalue()
+
+
+def heatmap_from_activations(
+    activations: np.ndarray, class_index: int, last_conv_layer_name="mixed10"
+) -> np.ndarray:
+    """由识别时捕获的目标层激活计算 uint8 热力图（梯度只经过分类头）"""
+    engine = get_gradcam_engine(last_conv_layer_name)
+    return quantize_heatmap(engine.heatmap_from_activations(activations, class_index))
+
+
+def blend_heatmap_jpeg(image: ImageSource, heatmap: np.ndarray, alpha=0.4) -> bytes:
+    """将已有热力图按透明度叠加到图像上并编码为 JPEG，不涉及模型计算"""
+    img_array = np.expand_dims(preprocess_image(image), axis=0)
+    ok, img_encoded = cv2.imencode(".jpg", overlay_heatmap(img_array, heatmap, alpha))
+    if not ok:
+        raise ValueError("Grad-CAM 图像编码失败")
+    return img_encoded.tobytes()
+
+
+async def _run_in_gradcam_pool(fn, *args):
+    """
+    在 Grad-CAM 专用线程池中执行，不阻塞事件循环
+
+    :raises QueueFullError: 等待中的 Grad-CAM 请求超过上限
+    """
+    global _gradcam_pending
+    if _gradcam_pending >= _gradcam_config["max_pending"]:
+        raise QueueFullError("热力图生成请求过多，请稍后重试")
+
+    _gradcam_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _gradcam_pool, fn, *args
+        )
+    finally:
+        _gradcam_pending -= 1
+
+
+async def generate_gradcam_jpeg_async(
+    image: ImageSource, last_conv_layer_name="mixed10", alpha=0.4
+) -> bytes:
+    """在 Grad-CAM 专用线程池中生成叠加图并编码为 JPEG"""
+    return await _run_in_gradcam_pool(
+        generate_gradcam_jpeg, image, last_conv_layer_name, alpha
+    )
+
+
+async def compute_heatmap_async(
+    image: ImageSource, last_conv_layer_name="mixed10", class_index=None
+) -> tuple:
+    """在 Grad-CAM 专用线程池中计算 uint8 热力图，返回 (heatmap, class_index)"""
+    return await _run_in_gradcam_pool(
+        compute_heatmap, image, last_conv_layer_name, class_index
+    )
+
+
+async def compute_class_heatmaps_async(
+    image: ImageSource, last_conv_layer_name="mixed10", class_indices=()
+) -> list:
+    """在 Grad-CAM 专用线程池中一次计算多个类别的 uint8 热力图"""
+    return await _run_in_gradcam_pool(
+        compute_class_heatmaps, image, last_conv_layer_name, class_indices
+    )
+
+
+async def blend_heatmaps_jpeg_async(
+    image: ImageSource, heatmaps: list, alpha=0.4
+) -> list:
+    """叠加多张已有热力图并编码为 JPEG"""
+    return await asyncio.to_thread(blend_heatmaps_jpeg, image, heatmaps, alpha)
+
+
+async def heatmap_from_activations_async(
+    activations: np.ndarray, class_index: int, last_conv_layer_name="mixed10"
+) -> np.ndarray:
+    """在 Grad-CAM 专用线程池中由已捕获的激活计算 uint8 热力图"""
+    return await _run_in_gradcam_pool(
+        heatmap_from_activations, activations, class_index, last_conv_layer_name
+    )
+
+
+async def get_or_compute_heatmaps(
+    db: AsyncSession,
+    identification_id: int,
+    image: ImageSource,
+    last_conv_layer_name="mixed10",
+    class_indices=(),
+) -> list:
+    """
+    获取识别记录多个类别的 uint8 热力图，按 class_indices 顺序返回
+
+    先查询热力图缓存，未命中的类别在一次前向传播中一起计算并写入缓存
+    """
+    model_version = get_gradcam_model_version()
+    heatmaps = {}
+    for index in class_indices:
+        heatmaps[index] = await db.run_sync(
+            heatmap_cache.get,
+            identification_id,
+            last_conv_layer_name,
+            index,
+            model_version,
+        )
+
+    missing = [index for index, heatmap in heatmaps.items() if heatmap is None]
+    if missing:
+        # 结束只读事务，计算热力图期间不占用数据库连接
+        await db.commit()
+    if len(missing) == 1:
+        heatmap, _ = await compute_heatmap_async(
+            image, last_conv_layer_name, missing[0]
+        )
+        computed = [heatmap]
+    elif missing:
+        computed = await compute_class_heatmaps_async(
+            image, last_conv_layer_name, missing
+        )
+    else:
+        computed = []
+
+    for index, heatmap in zip(missing, computed):
+        heatmaps[index] = heatmap
+        await db.run_sync(
+            heatmap_cache.put,
+            identification_id,
+            last_conv_layer_name,
+            index,
+            model_version,
+            heatmap,
+        )
+    return [heatmaps[index] for index in class_indices]
+
+
+async def blend_heatmap_jpeg_async(
+    image: ImageSource, heatmap: np.ndarray, alpha=0.4
+) -> bytes:
+    """
+    叠加已有热力图并编码为 JPEG
+
+    只有解码、混合与编码，耗时为毫秒级，不进入 Grad-CAM 线程池排队
+    """
+    return await asyncio.to_thread(blend_heatmap_jpeg, image, heatmap, alpha)
+
+
 # =========== 使用示例 ===========
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     # 1. 指定某张图片的绝对路径
     image_path = (
         r"C:\Users\Still\Downloads\preprocessed_images\preprocessed_images\1_right.jpg"
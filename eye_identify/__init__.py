@@ -1,2 +1,33 @@
-from .identify import identify_eye_async
-from .GradCam import generate_gradcam
+from .batcher import QueueFullError
+from .GradCam import (
+    blend_heatmap_jpeg_async,
+    blend_heatmaps_jpeg_async,
+    compute_heatmap_async,
+    generate_gradcam,
+    generate_gradcam_jpeg_async,
+    get_gradcam_model_version,
+    get_or_compute_heatmaps,
+    heatmap_from_activations_async,
+    pack_gradcam_zip,
+)
+from .gradcam_engine import GRADCAM_LAYERS
+from .heatmap_cache import heatmap_cache
+from .identify import (
+    get_admission_stats,
+    get_model_version,
+    identify_eye_async,
+    predict_probabilities_async,
+    predict_with_activations_async,
+    shutdown_inference,
+)
+from .labels import label_names
+from .model_registry import model_registry
+from .postprocess import postprocess_batch, postprocess_single
+from .recompress import RecompressedImage, recompress_image
+from .result_cache import result_cache
+from .thumbnails import (
+    get_or_create_thumbnail,
+    remove_thumbnails,
+    submit_thumbnails,
+)
+from .warmup import startup_report, warm_up
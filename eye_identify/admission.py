@@ -0,0 +1,154 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Hashable, Optional
+
+from .batcher import QueueFullError
+
+
+class AdmissionController:
+    """
+    识别请求准入控制
+
+    限制同时进行预处理与推理的请求数，超出的请求按用户分队列等待，
+    释放槽位时在有等待请求的用户之间轮询分配，避免单个用户的大量请求饿死其他用户。
+    排队数或预计等待时间超过上限时立即拒绝，并给出建议的重试间隔。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue_depth: int = 128,
+        max_estimated_wait_s: float = 10.0,
+        ewma_alpha: float = 0.2,
+    ):
+        """
+        :param max_concurrency: 同时处理的请求数上限
+        :param max_queue_depth: 等待准入的请求数上限
+        :param max_estimated_wait_s: 预计等待时间上限（秒），超过时直接拒绝
+        :param ewma_alpha: 单个请求处理耗时的指数加权平均系数
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.max_estimated_wait_s = max_estimated_wait_s
+        self.ewma_alpha = ewma_alpha
+
+        self._active = 0
+        # 用户 -> 等待中的 future 队列；按轮询顺序排列
+        self._waiters: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._waiting = 0
+        # 单个请求处理耗时的指数加权平均（秒），尚无样本时为 None
+        self._service_time: Optional[float] = None
+        self._admitted = 0
+        self._rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """当前等待准入的请求数"""
+        return self._waiting
+
+    def estimated_wait(self, position: Optional[int] = None) -> float:
+        """
+        估计排在第 position 个（默认为队尾）的请求需要等待的秒数
+
+        每释放一个槽位可以放行一个请求，因此等待时间约为
+        前方请求数 / 并发数 * 单个请求平均耗时。
+        """
+        if self._service_time is None:
+            return 0.0
+        if position is None:
+            position = self._waiting + 1
+        return position / self.max_concurrency * self._service_time
+
+    def _reject(self, message: str, wait: float) -> QueueFullError:
+        self._rejected += 1
+        return QueueFullError(message, retry_after=max(1, math.ceil(wait)))
+
+    async def acquire(self, user_key: Hashable = None) -> None:
+        """获取一个处理槽位，必要时按用户排队等待"""
+        if self._active < self.max_concurrency and not self._waiting:
+            self._active += 1
+            self._admitted += 1
+            return
+
+        wait = self.estimated_wait()
+        if self._waiting >= self.max_queue_depth:
+            raise self._reject("识别请求过多，请稍后重试", wait)
+        if wait > self.max_estimated_wait_s:
+            raise self._reject(f"识别服务繁忙，预计等待{wait:.1f}秒", wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_key, deque()).append(future)
+        self._waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已被分配槽位但调用方被取消，归还槽位
+                self.release()
+            else:
+                self._remove_waiter(user_key, future)
+            raise
+
+    def _remove_waiter(self, user_key: Hashable, future: asyncio.Future) -> None:
+        queue = self._waiters.get(user_key)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self._waiting -= 1
+        if not queue:
+            del self._waiters[user_key]
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """归还槽位，并按用户轮询放行下一个等待的请求"""
+        if service_time is not None:
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time += self.ewma_alpha * (
+                    service_time - self._service_time
+                )
+
+        self._active -= 1
+        while self._waiters and self._active < self.max_concurrency:
+            # 取出轮询顺序中的第一个用户，放行其最早的请求后移到队尾
+            user_key, queue = self._waiters.popitem(last=False)
+            future = queue.popleft()
+            self._waiting -= 1
+            if queue:
+                self._waiters[user_key] = queue
+            if future.done():
+                continue
+            self._active += 1
+            self._admitted += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, user_key: Hashable = None):
+        """async with admission.slot(user_id): ... 在槽位内执行预处理与推理"""
+        await self.acquire(user_key)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        """准入控制统计"""
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "waiting_users": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": self.max_queue_depth,
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            "avg_service_ms": (
+                round(self._service_time * 1000, 1)
+                if self._service_time is not None
+                else None
+            ),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+        }
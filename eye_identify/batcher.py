@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class QueueFullError(RuntimeError):
+    """推理队列已满"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        # 建议客户端重试前等待的秒数（对应 Retry-After 响应头）
+        self.retry_after = retry_after
+
+
+class BatchScheduler:
+    """
+    动态微批处理调度器
+
+    将并发提交的单张图像张量在一个时间窗口内合并为一个批次，
+    只执行一次前向推理，再把每一行概率分发给对应的等待协程。
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        executor: Optional[Executor] = None,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10,
+        max_queue_size: int = 256,
+        max_concurrent_batches: int = 1,
+    ):
+        """
+        :param predict_fn: 批量推理函数，输入 (N, H, W, 3)，输出 (N, num_labels)
+        :param executor: 执行推理的执行器，为None时使用事件循环默认执行器
+        :param max_batch_size: 单个批次的最大图像数
+        :param max_wait_ms: 收集批次的最长等待时间（毫秒）
+        :param max_queue_size: 排队请求的上限，超过时立即拒绝
+        :param max_concurrent_batches: 同时执行的批次数（多进程推理时等于工作进程数）
+        """
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue_size = max_queue_size
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._running_batches: set = set()
+
+    def _ensure_started(self) -> None:
+        """在当前事件循环中启动批处理后台任务（首次提交时惰性启动）"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = loop.create_task(self._run())
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队等待推理的请求数"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        提交一张预处理后的图像，等待其所在批次推理完成
+
+        :param tensor: 形状为 (1, H, W, 3) 的图像张量
+        :return: 该图像对应的一维概率向量
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((tensor, future))
+        except asyncio.QueueFull:
+            raise QueueFullError("识别请求过多，请稍后重试")
+        return await future
+
+    async def _collect_batch(self) -> list:
+        """阻塞等待第一个请求，然后在等待窗口内尽量凑满一个批次"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # 优先取走已经排队的请求，无需等待
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # 丢弃已被取消的请求（例如客户端断开）
+        return [(tensor, future) for tensor, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            # 等待空闲的执行槽位后再收集批次，使推理期间到达的请求合并进下一批
+            await self._batch_slots.acquire()
+            batch = await self._collect_batch()
+            if not batch:
+                self._batch_slots.release()
+                continue
+
+            task = self._loop.create_task(self._execute_batch(batch))
+            self._running_batches.add(task)
+            task.add_done_callback(self._running_batches.discard)
+
+    async def _execute_batch(self, batch: list) -> None:
+        try:
+            inputs = np.concatenate([tensor for tensor, _ in batch], axis=0)
+            preds = await self._loop.run_in_executor(
+                self.executor, self.predict_fn, inputs
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._batch_slots.release()
+
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(preds[i])
@@ -0,0 +1,145 @@
+"""
+推理引擎的一致性检查与性能基准
+
+用法:
+    python -m eye_identify.benchmark --images 眼底图像目录 \
+        [--engines keras,savedmodel,tflite_fp16,tflite_int8] \
+        [--tolerance 0.02] [--batch-size 8] [--repeats 20]
+
+以 Keras 引擎的输出为基准，逐标签比较 37 个标签的概率差异，
+并测量每个引擎的加载耗时、常驻内存增量、单张延迟和批量吞吐。
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .convert import list_images
+from .engines import ENGINE_NAMES, create_engine
+from .identify import load_and_preprocess_image
+from .labels import label_names
+
+
+def current_rss_bytes() -> int:
+    """当前进程常驻内存（仅 Linux，其他平台返回0）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, AttributeError, ValueError):
+        return 0
+
+
+def measure_latency(engine, inputs: np.ndarray, repeats: int) -> np.ndarray:
+    """重复推理，返回每次耗时（毫秒）"""
+    engine.predict(inputs)  # 预热
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.predict(inputs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.asarray(timings)
+
+
+def predict_all(engine, images: np.ndarray, batch_size: int) -> np.ndarray:
+    return np.concatenate(
+        [
+            engine.predict(images[i : i + batch_size])
+            for i in range(0, len(images), batch_size)
+        ],
+        axis=0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推理引擎一致性检查与性能基准")
+    parser.add_argument("--images", type=Path, required=True, help="样本图像目录")
+    parser.add_argument("--limit", type=int, default=64, help="样本图像数量上限")
+    parser.add_argument(
+        "--engines", default=",".join(ENGINE_NAMES), help="逗号分隔的引擎名称"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.02, help="单标签概率最大允许偏差"
+    )
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    image_paths = list_images(args.images, args.limit)
+    if not image_paths:
+        raise SystemExit(f"目录中没有图像: {args.images}")
+    images = np.concatenate([load_and_preprocess_image(p) for p in image_paths])
+    print(f"样本图像: {len(images)} 张")
+
+    engine_names = [name.strip() for name in args.engines.split(",") if name.strip()]
+    reference = None
+    summary = []
+
+    # 以 Keras 引擎为基准，总是最先运行
+    for name in ["keras", *[n for n in engine_names if n != "keras"]]:
+        rss_before = current_rss_bytes()
+        try:
+            engine = create_engine(name)
+        except FileNotFoundError as e:
+            print(f"[{name}] 跳过: {e}")
+            continue
+        rss_delta = current_rss_bytes() - rss_before
+
+        probabilities = predict_all(engine, images, args.batch_size)
+        if reference is None:
+            reference = probabilities
+
+        diff = np.abs(probabilities - reference)
+        per_label_max = diff.max(axis=0)
+        top1_agreement = float(
+            np.mean(probabilities.argmax(axis=1) == reference.argmax(axis=1))
+        )
+        single = measure_latency(engine, images[:1], args.repeats)
+        batch = measure_latency(engine, images[: args.batch_size], args.repeats)
+        passed = bool(per_label_max.max() <= args.tolerance)
+
+        summary.append(
+            {
+                "engine": name,
+                "load_s": engine.load_time,
+                "rss_mb": rss_delta / 1024 / 1024,
+                "p50_ms": float(np.percentile(single, 50)),
+                "p95_ms": float(np.percentile(single, 95)),
+                "images_per_s": len(images[: args.batch_size])
+                / (float(np.median(batch)) / 1000),
+                "max_diff": float(per_label_max.max()),
+                "mean_diff": float(diff.mean()),
+                "top1": top1_agreement,
+                "passed": passed,
+            }
+        )
+
+        if name != "keras":
+            print(f"\n[{name}] 逐标签最大概率偏差:")
+            for label, value in zip(label_names, per_label_max):
+                flag = "" if value <= args.tolerance else "  <-- 超出容差"
+                print(f"  {label:<45} {value:.5f}{flag}")
+
+    print(
+        f"\n{'engine':<12} {'load(s)':>8} {'rss(MB)':>8} {'p50(ms)':>8} "
+        f"{'p95(ms)':>8} {'img/s':>8} {'max diff':>9} {'mean diff':>10} "
+        f"{'top1':>6} {'parity':>7}"
+    )
+    for row in summary:
+        print(
+            f"{row['engine']:<12} {row['load_s']:>8.2f} {row['rss_mb']:>8.0f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['images_per_s']:>8.1f} "
+            f"{row['max_diff']:>9.5f} {row['mean_diff']:>10.6f} {row['top1']:>6.2%} "
+            f"{'OK' if row['passed'] else 'FAIL':>7}"
+        )
+
+    passing = [row for row in summary if row["passed"]]
+    if passing:
+        fastest = max(passing, key=lambda row: row["images_per_s"])
+        print(f"\n容差 {args.tolerance} 内吞吐最高的引擎: {fastest['engine']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+将 model.h5 转换为其他推理引擎使用的模型格式
+
+用法:
+    python -m eye_identify.convert [--calibration-dir 眼底图像目录] [--calibration-count 100]
+
+输出到 eye_identify/exported/：
+    saved_model/        SavedModel（serving_default 签名）
+    model_fp16.tflite   float16 权重量化的 TFLite 模型
+    model_int8.tflite   int8 量化的 TFLite 模型
+                        提供校准图像时为全整数量化，否则为仅权重的动态范围量化
+"""
+
+import argparse
+from pathlib import Path
+
+import tensorflow as tf
+
+from .engines import EXPORT_DIR, SAVED_MODEL_DIR, TFLITE_PATHS
+from .identify import load_and_preprocess_image
+from .model_registry import model_registry
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+def list_images(image_dir: Path, limit: int) -> list:
+    """列出目录下的图像文件（按文件名排序，最多 limit 张）"""
+    paths = sorted(
+        p for p in Path(image_dir).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES
+    )
+    return paths[:limit]
+
+
+def export_saved_model(model, output_dir: Path) -> None:
+    """导出带 serving_default 签名的 SavedModel"""
+    if hasattr(model, "export"):
+        # Keras 3
+        model.export(str(output_dir))
+    else:
+        tf.saved_model.save(model, str(output_dir))
+
+
+def convert_tflite_fp16(saved_model_dir: Path, output_path: Path) -> None:
+    """float16 权重量化，精度损失很小，模型体积减半"""
+    converter = tf.lite.TFLiteConverter.from_saved_model(str(saved_model_dir))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    output_path.write_bytes(converter.convert())
+
+
+def convert_tflite_int8(
+    saved_model_dir: Path, output_path: Path, calibration_images: list
+) -> None:
+    """int8 量化；有校准图像时量化激活值，否则只量化权重"""
+    converter = tf.lite.TFLiteConverter.from_saved_model(str(saved_model_dir))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if calibration_images:
+
+        def representative_dataset():
+            for image_path in calibration_images:
+                yield [load_and_preprocess_image(image_path)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    output_path.write_bytes(converter.convert())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="将 model.h5 转换为各推理引擎的模型格式"
+    )
+    parser.add_argument(
+        "--calibration-dir", type=Path, help="int8 量化校准用的眼底图像目录"
+    )
+    parser.add_argument(
+        "--calibration-count", type=int, default=100, help="校准图像数量上限"
+    )
+    args = parser.parse_args()
+
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    model = model_registry.get("default")
+
+    print(f"导出 SavedModel -> {SAVED_MODEL_DIR}")
+    export_saved_model(model, SAVED_MODEL_DIR)
+
+    print(f"转换 TFLite float16 -> {TFLITE_PATHS['tflite_fp16']}")
+    convert_tflite_fp16(SAVED_MODEL_DIR, TFLITE_PATHS["tflite_fp16"])
+
+    calibration_images = []
+    if args.calibration_dir:
+        calibration_images = list_images(args.calibration_dir, args.calibration_count)
+    if not calibration_images:
+        print("未提供校准图像，int8 模型使用仅权重的动态范围量化")
+    print(f"转换 TFLite int8 -> {TFLITE_PATHS['tflite_int8']}")
+    convert_tflite_int8(
+        SAVED_MODEL_DIR, TFLITE_PATHS["tflite_int8"], calibration_images
+    )
+
+    for name, path in TFLITE_PATHS.items():
+        print(f"{name}: {path.stat().st_size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+图像解码与预处理的性能基准
+
+用法:
+    python -m eye_identify.decode_benchmark --images 眼底图像目录 \
+        [--limit 64] [--repeats 5] [--engine keras]
+
+比较三种预处理方式：
+  - full:        全分辨率解码后缩放（原有方式）
+  - reduced:     按 JPEG 头部尺寸降采样解码后缩放
+  - reduced_crop: 降采样解码、裁剪眼底区域后缩放（默认配置）
+报告每张图像的解码+预处理耗时、解码后的像素内存，以及与 full 方式的
+输入像素差异；指定 --engine 时还会比较模型输出概率的差异。
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from Config import Config
+
+from .benchmark import predict_all
+from .convert import list_images
+from .image_io import crop_fundus, read_fundus_image
+
+
+def preprocess(image_bytes: bytes, reduced_decode: bool, crop: bool, target_size=224):
+    """
+    按指定方式预处理，返回 (224, 224, 3) 的输入和解码后的像素字节数
+
+    裁剪使用配置的阈值，与识别时的预处理（read_fundus_image）一致
+    """
+    img_bgr = read_fundus_image(
+        image_bytes, target_size, reduced_decode=reduced_decode, crop=False
+    )
+    decoded_bytes = img_bgr.nbytes
+    if crop:
+        img_bgr = crop_fundus(
+            img_bgr, Config.IDENTIFICATION_CONFIG["fundus_crop_threshold"]
+        )
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+    img_rgb = cv2.resize(img_rgb, (target_size, target_size))
+    return img_rgb.astype(np.float32) / 255.0, decoded_bytes
+
+
+MODES = {
+    "full": {"reduced_decode": False, "crop": False},
+    "reduced": {"reduced_decode": True, "crop": False},
+    "reduced_crop": {"reduced_decode": True, "crop": True},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图像解码与预处理性能基准")
+    parser.add_argument("--images", type=Path, required=True, help="样本图像目录")
+    parser.add_argument("--limit", type=int, default=64, help="样本图像数量上限")
+    parser.add_argument("--repeats", type=int, default=5, help="每张图像重复次数")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument(
+        "--engine", default=None, help="同时比较模型输出概率所用的推理引擎"
+    )
+    args = parser.parse_args()
+
+    image_paths = list_images(args.images, args.limit)
+    if not image_paths:
+        raise SystemExit(f"目录中没有图像: {args.images}")
+    # 预先读入内存，只测量解码与预处理
+    sources = [path.read_bytes() for path in image_paths]
+    print(f"样本图像: {len(sources)} 张")
+
+    inputs = {}
+    summary = []
+    for mode, options in MODES.items():
+        timings = []
+        decoded = []
+        outputs = []
+        for image_bytes in sources:
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                output, decoded_bytes = preprocess(image_bytes, **options)
+                timings.append((time.perf_counter() - start) * 1000)
+            decoded.append(decoded_bytes)
+            outputs.append(output)
+        inputs[mode] = np.stack(outputs)
+        pixel_diff = np.abs(inputs[mode] - inputs["full"])
+        summary.append(
+            {
+                "mode": mode,
+                "p50_ms": float(np.percentile(timings, 50)),
+                "p95_ms": float(np.percentile(timings, 95)),
+                "decoded_mb": float(np.mean(decoded)) / 1024 / 1024,
+                "pixel_mean": float(pixel_diff.mean()),
+                "pixel_max": float(pixel_diff.max()),
+            }
+        )
+
+    print(
+        f"\n{'mode':<13} {'p50(ms)':>8} {'p95(ms)':>8} {'decoded(MB)':>12} "
+        f"{'pixel mean':>11} {'pixel max':>10}"
+    )
+    for row in summary:
+        print(
+            f"{row['mode']:<13} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+            f"{row['decoded_mb']:>12.2f} {row['pixel_mean']:>11.5f} "
+            f"{row['pixel_max']:>10.5f}"
+        )
+
+    if args.engine:
+        from .engines import create_engine
+
+        engine = create_engine(args.engine)
+        probabilities = {
+            mode: predict_all(engine, batch, args.batch_size)
+            for mode, batch in inputs.items()
+        }
+        reference = probabilities["full"]
+        print(f"\n[{args.engine}] 与 full 方式相比的模型输出差异:")
+        print(f"{'mode':<13} {'max diff':>9} {'mean diff':>10} {'top1':>6}")
+        for mode, values in probabilities.items():
+            diff = np.abs(values - reference)
+            top1 = float(np.mean(values.argmax(axis=1) == reference.argmax(axis=1)))
+            print(f"{mode:<13} {diff.max():>9.5f} {diff.mean():>10.6f} {top1:>6.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .model_registry import model_registry
+
+# 由 model.h5 转换得到的模型文件目录（见 eye_identify.convert）
+EXPORT_DIR = Path(__file__).parent / "exported"
+SAVED_MODEL_DIR = EXPORT_DIR / "saved_model"
+TFLITE_PATHS = {
+    "tflite_fp16": EXPORT_DIR / "model_fp16.tflite",
+    "tflite_int8": EXPORT_DIR / "model_int8.tflite",
+}
+
+
+class InferenceEngine:
+    """推理引擎基类：输入 (N, 224, 224, 3) 的 float32 批次，输出 (N, 37) 的概率"""
+
+    name = "base"
+
+    def __init__(self):
+        start = time.perf_counter()
+        self._load()
+        self.load_time = time.perf_counter() - start
+
+    def _load(self) -> None:
+        raise NotImplementedError
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @property
+    def version(self) -> str:
+        """引擎版本：源模型版本 + 引擎名称，不同引擎的结果不共享缓存"""
+        return engine_version(self.name)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "engine": self.name,
+            "version": self.version,
+            "load_time_seconds": round(self.load_time, 3),
+        }
+
+
+class KerasEngine(InferenceEngine):
+    """直接使用注册表中的 Keras 模型推理（与 Grad-CAM 共享权重）"""
+
+    name = "keras"
+
+    def _load(self) -> None:
+        self.model = model_registry.get("default")
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class SavedModelEngine(InferenceEngine):
+    """使用导出的 SavedModel serving 签名推理，省去 Keras 的调用开销"""
+
+    name = "savedmodel"
+
+    def _load(self) -> None:
+        if not SAVED_MODEL_DIR.exists():
+            raise FileNotFoundError(
+                f"SavedModel 不存在: {SAVED_MODEL_DIR}，请先运行 python -m eye_identify.convert"
+            )
+        import tensorflow as tf
+
+        self._tf = tf
+        self._loaded = tf.saved_model.load(str(SAVED_MODEL_DIR))
+        self._signature = self._loaded.signatures["serving_default"]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        tf = self._tf
+        outputs = self._signature(tf.constant(batch, dtype=tf.float32))
+        # serving 签名只有一个输出
+        return next(iter(outputs.values())).numpy()
+
+
+class TFLiteEngine(InferenceEngine):
+    """使用 TFLite 解释器推理，支持 float16 与 int8 量化模型"""
+
+    def __init__(self, name: str, num_threads: Optional[int] = None):
+        self.name = name
+        self.num_threads = num_threads
+        super().__init__()
+
+    def _load(self) -> None:
+        model_path = TFLITE_PATHS[self.name]
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"TFLite 模型不存在: {model_path}，请先运行 python -m eye_identify.convert"
+            )
+        import tensorflow as tf
+
+        self._interpreter = tf.lite.Interpreter(
+            model_path=str(model_path), num_threads=self.num_threads
+        )
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # 解释器不是线程安全的
+        self._lock = threading.Lock()
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        """int8 模型的输入需要按量化参数转换"""
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(
+            dtype
+        )
+
+    def _dequantize(self, output: np.ndarray) -> np.ndarray:
+        if self._output["dtype"] == np.float32:
+            return output
+        scale, zero_point = self._output["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            # 批大小变化时才重新分配张量
+            if len(batch) != self._batch_size:
+                self._interpreter.resize_tensor_input(
+                    self._input["index"], [len(batch), *self._input["shape"][1:]]
+                )
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output["index"])
+        return self._dequantize(output)
+
+
+_tf_threads_configured = False
+
+
+def configure_tf_threads(intra_op_threads: int = 0, inter_op_threads: int = 0) -> None:
+    """
+    设置当前进程的 TF 算子内/算子间线程数，0 表示使用 TF 默认值（按 CPU 核数）
+
+    必须在 TF 运行时初始化（第一次执行算子或加载模型）之前调用，
+    之后再调用不会生效，只在进程内第一次调用时设置。
+    """
+    global _tf_threads_configured
+    if _tf_threads_configured:
+        return
+    import tensorflow as tf
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        # 运行时已经初始化，保持当前设置
+        pass
+    _tf_threads_configured = True
+
+
+ENGINE_NAMES = ["keras", "savedmodel", *TFLITE_PATHS]
+
+
+def engine_version(name: str) -> str:
+    """引擎版本号（不需要加载引擎）"""
+    return f"{model_registry.version('default')}-{name}"
+
+
+def create_engine(name: str, num_threads: Optional[int] = None) -> InferenceEngine:
+    """按名称创建推理引擎"""
+    if name == "keras":
+        return KerasEngine()
+    if name == "savedmodel":
+        return SavedModelEngine()
+    if name in TFLITE_PATHS:
+        return TFLiteEngine(name, num_threads=num_threads)
+    raise ValueError(f"未知的推理引擎: {name}，可选: {', '.join(ENGINE_NAMES)}")
+
+
+_engines: Dict[str, InferenceEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name: str, num_threads: Optional[int] = None) -> InferenceEngine:
+    """获取进程内共享的推理引擎，首次访问时加载"""
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = create_engine(name, num_threads=num_threads)
+        return _engines[name]
@@ -0,0 +1,251 @@
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .model_registry import model_registry
+
+# 可用于 Grad-CAM 的 InceptionV3 卷积块输出层
+GRADCAM_LAYERS = ["mixed7", "mixed8", "mixed9", "mixed10"]
+
+
+class GradCamEngine:
+    """
+    编译后的 Grad-CAM 计算图
+
+    以目标卷积层切分模型：特征提取子模型同时输出目标层激活与骨干网络输出，
+    分类头（model.layers[1:]）接在骨干网络输出之后。整个前向与梯度计算
+    包装在固定输入签名的 tf.function 中，只在首次调用时追踪一次。
+    """
+
+    def __init__(self, model, layer_name: str = "mixed10", input_size: int = 224):
+        """
+        :param model: Sequential 模型，第一层为嵌入的 InceptionV3
+        :param layer_name: 目标卷积层名称，如 'mixed7' ... 'mixed10'
+        :param input_size: 输入图像边长
+        """
+        import tensorflow as tf
+
+        self._tf = tf
+        self.layer_name = layer_name
+
+        # 获取嵌入的 InceptionV3 模型
+        inception = model.layers[0]
+        try:
+            conv_layer = inception.get_layer(layer_name)
+        except ValueError:
+            raise ValueError(f"模型中不存在卷积层: {layer_name}")
+
+        # 特征提取部分：目标层激活 + 骨干网络输出
+        self._features = tf.keras.Model(
+            inception.inputs, [conv_layer.output, inception.output]
+        )
+        # 分类头部分
+        self._head = model.layers[1:]
+        # 目标层即骨干网络输出时（mixed10），梯度只需经过分类头
+        self.is_backbone_output = layer_name == inception.layers[-1].name
+        conv_shape = tuple(conv_layer.output.shape[1:])
+
+        self._compute = tf.function(
+            self._compute_heatmaps,
+            input_signature=[
+                tf.TensorSpec([None, input_size, input_size, 3], tf.float32),
+                tf.TensorSpec([None], tf.int32),
+            ],
+        )
+        self._compute_multi = tf.function(
+            self._compute_class_heatmaps,
+            input_signature=[
+                tf.TensorSpec([1, input_size, input_size, 3], tf.float32),
+                tf.TensorSpec([None], tf.int32),
+            ],
+        )
+
+        self._forward = tf.function(
+            self._forward_activations,
+            input_signature=[
+                tf.TensorSpec([None, input_size, input_size, 3], tf.float32)
+            ],
+        )
+        self._compute_from_activations = tf.function(
+            self._compute_head_heatmaps,
+            input_signature=[
+                tf.TensorSpec([None, *conv_shape], tf.float32),
+                tf.TensorSpec([None], tf.int32),
+            ],
+        )
+
+    def _forward_activations(self, images):
+        """只做前向传播，返回目标层激活与预测概率"""
+        conv_outputs, x = self._features(images)
+        for layer in self._head:
+            x = layer(x)
+        return conv_outputs, x
+
+    def _compute_head_heatmaps(self, conv_outputs, class_indices):
+        """由已捕获的骨干网络输出计算热力图，梯度只经过分类头"""
+        tf = self._tf
+        with tf.GradientTape() as tape:
+            tape.watch(conv_outputs)
+            x = conv_outputs
+            for layer in self._head:
+                x = layer(x)
+            class_channel = tf.gather(x, class_indices, batch_dims=1)
+
+        grads = tape.gradient(class_channel, conv_outputs)
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+
+        heatmaps = tf.einsum("nhwc,nc->nhw", conv_outputs, pooled_grads)
+        heatmaps = tf.maximum(heatmaps, 0)
+        max_vals = tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True)
+        return tf.math.divide_no_nan(heatmaps, max_vals)
+
+    def _compute_heatmaps(self, images, class_indices):
+        """
+        批量计算热力图
+
+        :param images: (N, H, W, 3) 预处理后的图像
+        :param class_indices: (N,) 每张图像的目标类别，-1 表示取预测得分最高的类别
+        :return: (N, h, w) 归一化到 [0, 1] 的热力图，以及 (N, 37) 的预测概率
+        """
+        tf = self._tf
+        with tf.GradientTape() as tape:
+            conv_outputs, x = self._features(images)
+            for layer in self._head:
+                x = layer(x)
+            predictions = x
+
+            top_indices = tf.argmax(predictions, axis=1, output_type=tf.int32)
+            class_indices = tf.where(class_indices >= 0, class_indices, top_indices)
+            class_channel = tf.gather(predictions, class_indices, batch_dims=1)
+
+        # 每张图像的得分只依赖自身的激活，对批次求梯度即得到逐图像梯度
+        grads = tape.gradient(class_channel, conv_outputs)
+        pooled_grads = tf.reduce_mean(grads, axis=(1, 2))
+
+        heatmaps = tf.einsum("nhwc,nc->nhw", conv_outputs, pooled_grads)
+        # ReLU 截断负值并逐图像归一化
+        heatmaps = tf.maximum(heatmaps, 0)
+        max_vals = tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True)
+        heatmaps = tf.math.divide_no_nan(heatmaps, max_vals)
+        return heatmaps, predictions
+
+    def _compute_class_heatmaps(self, image, class_indices):
+        """
+        一次前向传播计算单张图像多个类别的热力图
+
+        对选中类别的得分求雅可比矩阵（向量化的批量反向传播），
+        代价约为单类别的小倍数，而不是每个类别各做一次前向与反向传播。
+
+        :param image: (1, H, W, 3) 预处理后的图像
+        :param class_indices: (K,) 需要解释的类别
+        :return: (K, h, w) 归一化到 [0, 1] 的热力图，以及 (37,) 的预测概率
+        """
+        tf = self._tf
+        with tf.GradientTape() as tape:
+            conv_outputs, x = self._features(image)
+            for layer in self._head:
+                x = layer(x)
+            predictions = x[0]
+            class_channels = tf.gather(predictions, class_indices)
+
+        # (K, 1, h, w, c)：每个类别得分对目标层激活的梯度
+        grads = tape.jacobian(class_channels, conv_outputs)
+        pooled_grads = tf.reduce_mean(grads[:, 0], axis=(1, 2))
+
+        heatmaps = tf.einsum("hwc,kc->khw", conv_outputs[0], pooled_grads)
+        heatmaps = tf.maximum(heatmaps, 0)
+        max_vals = tf.reduce_max(heatmaps, axis=(1, 2), keepdims=True)
+        heatmaps = tf.math.divide_no_nan(heatmaps, max_vals)
+        return heatmaps, predictions
+
+    def class_heatmaps(
+        self, img_array: np.ndarray, class_indices
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算单张图像多个类别的热力图
+
+        :param img_array: (1, 224, 224, 3) 预处理后的图像，取值范围 [0, 1]
+        :param class_indices: 需要解释的类别索引列表
+        :return: ((K, h, w) 热力图, (37,) 预测概率)
+        """
+        heatmaps, predictions = self._compute_multi(
+            np.asarray(img_array[:1], dtype=np.float32),
+            np.asarray(class_indices, dtype=np.int32),
+        )
+        return heatmaps.numpy(), predictions.numpy()
+
+    def heatmaps(
+        self, img_array: np.ndarray, class_indices: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        计算一批图像的热力图
+
+        :param img_array: (N, 224, 224, 3) 预处理后的图像，取值范围 [0, 1]
+        :param class_indices: 可选，(N,) 每张图像的目标类别，默认取预测得分最高的类别
+        :return: ((N, h, w) 热力图, (N, 37) 预测概率)
+        """
+        img_array = np.asarray(img_array, dtype=np.float32)
+        if class_indices is None:
+            class_indices = np.full(len(img_array), -1, dtype=np.int32)
+        heatmaps, predictions = self._compute(
+            img_array, np.asarray(class_indices, dtype=np.int32)
+        )
+        return heatmaps.numpy(), predictions.numpy()
+
+    def forward(self, img_array: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        前向传播并捕获目标层激活，供之后计算热力图
+
+        :param img_array: (N, 224, 224, 3) 预处理后的图像
+        :return: ((N, 37) 预测概率, (N, h, w, c) 目标层激活)
+        """
+        conv_outputs, predictions = self._forward(
+            np.asarray(img_array, dtype=np.float32)
+        )
+        return predictions.numpy(), conv_outputs.numpy()
+
+    def heatmap_from_activations(
+        self, activations: np.ndarray, class_index: int
+    ) -> np.ndarray:
+        """
+        由 forward() 捕获的单张图像激活 (h, w, c) 计算热力图，返回 (h, w)
+
+        只支持骨干网络输出层（mixed10），此时梯度只经过分类头，无需再次前向传播
+        """
+        if not self.is_backbone_output:
+            raise ValueError(f"卷积层 {self.layer_name} 不支持由激活直接计算热力图")
+        heatmaps = self._compute_from_activations(
+            np.asarray(activations, dtype=np.float32)[None],
+            np.asarray([class_index], dtype=np.int32),
+        )
+        return heatmaps.numpy()[0]
+
+    def heatmap(self, img_array: np.ndarray, pred_index: Optional[int] = None):
+        """计算单张图像 (1, 224, 224, 3) 的热力图，返回 (h, w)"""
+        class_indices = None if pred_index is None else [pred_index]
+        return self.heatmaps(img_array[:1], class_indices)[0][0]
+
+
+_engines: Dict[Tuple[str, str], GradCamEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_gradcam_engine(
+    layer_name: str = "mixed10",
+    model_name: Optional[str] = None,
+    model_path: Optional[Path] = None,
+) -> GradCamEngine:
+    """获取 (模型版本, 目标层) 对应的 Grad-CAM 引擎，首次访问时构建"""
+    # 引擎构建后常驻内存，只允许预设的层，避免任意层名各自生成一个计算图
+    assert layer_name in GRADCAM_LAYERS, f"不支持的 Grad-CAM 目标层: {layer_name}"
+    loaded = model_registry.get_loaded(model_name, model_path)
+    key = (loaded.version, layer_name)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = GradCamEngine(loaded.model, layer_name)
+        return _engines[key]
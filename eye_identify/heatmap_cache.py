@@ -0,0 +1,164 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from Config import Config
+from models.GradcamHeatmap import GradcamHeatmap
+
+# 每个内存条目除热力图数据外的估计开销（键、数组对象头等）
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+def quantize_heatmap(heatmap: np.ndarray) -> np.ndarray:
+    """将 [0, 1] 的热力图量化为 uint8"""
+    return np.uint8(np.clip(np.round(heatmap * 255), 0, 255))
+
+
+class HeatmapCache:
+    """
+    Grad-CAM 热力图缓存
+
+    以 (识别记录ID, 目标层, 类别索引, 模型版本) 为键，保存目标层分辨率的
+    uint8 热力图：一级为按字节预算淘汰的进程内 LRU，二级为数据库表。
+    叠加透明度只影响最后的图像混合，调整 alpha 时无需重新计算梯度。
+    """
+
+    def __init__(self, memory_bytes: int = 64 * 1024 * 1024):
+        """
+        :param memory_bytes: 进程内 LRU 的字节预算
+        """
+        self.memory_bytes = memory_bytes
+
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_size(heatmap: np.ndarray) -> int:
+        return heatmap.nbytes + _ENTRY_OVERHEAD_BYTES
+
+    def _remember(self, key: tuple, heatmap: np.ndarray) -> None:
+        """写入进程内 LRU，超出字节预算时淘汰最久未使用的条目"""
+        if self.memory_bytes <= 0:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_used -= self._entry_size(previous)
+            self._memory[key] = heatmap
+            self._memory_used += self._entry_size(heatmap)
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= self._entry_size(evicted)
+
+    def get(
+        self,
+        db: Session,
+        identification_id: int,
+        layer_name: str,
+        class_index: int,
+        model_version: str,
+    ) -> Optional[np.ndarray]:
+        """查询缓存，命中时返回 (h, w) 的 uint8 热力图，未命中返回None"""
+        key = (identification_id, layer_name, class_index, model_version)
+        with self._lock:
+            heatmap = self._memory.get(key)
+            if heatmap is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return heatmap
+
+        record = (
+            db.query(GradcamHeatmap)
+            .filter(
+                GradcamHeatmap.identification_id == identification_id,
+                GradcamHeatmap.layer_name == layer_name,
+                GradcamHeatmap.class_index == class_index,
+                GradcamHeatmap.model_version == model_version,
+            )
+            .first()
+        )
+        if record is None:
+            self.misses += 1
+            return None
+
+        heatmap = np.frombuffer(record.data, dtype=np.uint8).reshape(
+            record.height, record.width
+        )
+        self._remember(key, heatmap)
+        self.db_hits += 1
+        return heatmap
+
+    def put(
+        self,
+        db: Session,
+        identification_id: int,
+        layer_name: str,
+        class_index: int,
+        model_version: str,
+        heatmap: np.ndarray,
+    ) -> None:
+        """写入两级缓存，heatmap 为 uint8 或 [0, 1] 的浮点热力图"""
+        if heatmap.dtype != np.uint8:
+            heatmap = quantize_heatmap(heatmap)
+        heatmap = np.ascontiguousarray(heatmap)
+        self._remember(
+            (identification_id, layer_name, class_index, model_version), heatmap
+        )
+
+        db.add(
+            GradcamHeatmap(
+                identification_id=identification_id,
+                layer_name=layer_name,
+                class_index=class_index,
+                model_version=model_version,
+                height=heatmap.shape[0],
+                width=heatmap.shape[1],
+                data=heatmap.tobytes(),
+            )
+        )
+        try:
+            db.commit()
+        except IntegrityError:
+            # 同一热力图被并发生成，另一请求已写入
+            db.rollback()
+
+    def evict(self, db: Session, identification_id: int) -> int:
+        """删除识别记录的全部热力图（不提交事务），返回删除的数据库记录数"""
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == identification_id]:
+                self._memory_used -= self._entry_size(self._memory.pop(key))
+        return (
+            db.query(GradcamHeatmap)
+            .filter(GradcamHeatmap.identification_id == identification_id)
+            .delete(synchronize_session=False)
+        )
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            ),
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "memory_budget_bytes": self.memory_bytes,
+        }
+
+
+# 全局热力图缓存
+heatmap_cache = HeatmapCache(
+    memory_bytes=Config.CACHE_CONFIG["heatmap_memory_bytes"],
+)
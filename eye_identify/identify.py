@@ -5,110 +5,46 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"  # 只显示 Error 信息
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Hashable, Optional
 
 import cv2
 import numpy as np
-import tensorflow as tf
 
-model_path = Path(__file__).parent / "model.h5"
+from Config import Config
+
+from .admission import AdmissionController
+from .batcher import BatchScheduler
+from .engines import configure_tf_threads, engine_version, get_engine
+from .gradcam_engine import get_gradcam_engine
+from .image_io import ImageSource, read_fundus_image
+from .postprocess import postprocess_single
+from .process_pool import ProcessInferencePool
+
+_identification_config = Config.IDENTIFICATION_CONFIG
+
+# 图像解码与预处理线程池（固定大小，避免与 TF 线程争抢 CPU）
+_thread_pool = ThreadPoolExecutor(
+    max_workers=_identification_config["preprocess_threads"],
+    thread_name_prefix="preprocess",
+)
 
-# 创建线程池执行器
-_thread_pool = ThreadPoolExecutor()
 
 # ========== 1. 加载训练好的模型 ==========
-model = tf.keras.models.load_model(model_path, compile=False)
-
-# ========== 2. 定义类别名称 ==========
-label_names = [
-    "branch retinal vein occlusion",  # O
-    "cataract",  # C
-    "central retinal vein occlusion",  # O
-    "chorioretinal atrophy",  # O
-    "diabetic retinopathy",  # D
-    "drusen",  # O
-    "dry age-related macular degeneration",  # A
-    "epiretinal membrane",  # O
-    "epiretinal membrane over the macula",  # O
-    "glaucoma",  # G
-    "hypertensive retinopathy",  # H
-    "laser spot",  # O
-    "lens dust",  # None
-    "macular epiretinal membrane",  # O
-    "maculopathy",  # O
-    "mild nonproliferative retinopathy",  # D
-    "moderate non proliferative retinopathy",  # D
-    "myelinated nerve fibers",  # O
-    "myopia retinopathy",  # M
-    "normal fundus",  # N
-    "optic disc edema",  # O
-    "pathological myopia",  # M
-    "peripapillary atrophy",  # O
-    "post laser photocoagulation",  # O
-    "post retinal laser surgery",  # O
-    "proliferative diabetic retinopathy",  # D
-    "refractive media opacity",  # O
-    "retinal pigmentation",  # O
-    "retinitis pigmentosa",  # O
-    "severe nonproliferative retinopathy",  # D
-    "severe proliferative diabetic retinopathy",  # D
-    "spotted membranous change",  # O
-    "suspected glaucoma",  # G
-    "tessellated fundus",  # O
-    "vitreous degeneration",  # O
-    "wet age-related macular degeneration",  # A
-    "white vessel",  # O
-]
-
-# ========== 2.1 标签类别字典 ==========
-label_categories = [
-    "O",
-    "C",
-    "O",
-    "O",
-    "D",
-    "O",
-    "A",
-    "O",
-    "O",
-    "G",
-    "H",
-    "O",
-    None,
-    "O",
-    "O",
-    "D",
-    "D",
-    "O",
-    "M",
-    "N",
-    "O",
-    "M",
-    "O",
-    "O",
-    "O",
-    "D",
-    "O",
-    "O",
-    "O",
-    "D",
-    "D",
-    "O",
-    "G",
-    "O",
-    "O",
-    "A",
-    "O",
-]
-
-# 将标签名和对应的类别映射成字典
-label_to_category = {name: cat for name, cat in zip(label_names, label_categories)}
+# 推理引擎按需加载（见 get_inference_engine），Keras 引擎通过全局注册表获取模型，
+# 与 Grad-CAM 共享同一份权重；多进程推理的工作进程导入本模块时不会多加载一份模型。
 
 
 # ========== 3. 定义图像预处理函数 ==========
-def load_and_preprocess_image(image_path, target_size=224):
-    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
-    if image is None:
-        raise ValueError(f"图像无法读取: {image_path}")
+def load_and_preprocess_image(image: ImageSource, target_size=224):
+    """读取图像（文件路径或内存字节）并预处理为 (1, 224, 224, 3) 的张量"""
+    config = _identification_config
+    image = read_fundus_image(
+        image,
+        target_size,
+        reduced_decode=config["reduced_decode"],
+        crop=config["fundus_crop"],
+        crop_threshold=config["fundus_crop_threshold"],
+    )
     image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     image = cv2.resize(image, (target_size, target_size))
     image = image.astype("float32") / 255.0
@@ -117,23 +53,82 @@ def load_and_preprocess_image(image_path, target_size=224):
 
 
 # ========== 4. 预测单张图像的多标签结果 ==========
-def predict_single_image(image_path):
-    preprocessed = load_and_preprocess_image(image_path)
-    preds = model.predict(preprocessed)
-    predicted_mask = preds[0]
-
-    label_with_category = []
-
-    for i, val in enumerate(predicted_mask):
-        label = label_names[i]
-        label_with_category.append(
-            {
-                "label": label,
-                "probability": val.item(),
-            }
-        )
+def configure_inference_threads():
+    """按配置设置 API 进程的 TF 线程数（需在加载模型之前调用）"""
+    configure_tf_threads(
+        _identification_config["tf_intra_op_threads"],
+        _identification_config["tf_inter_op_threads"],
+    )
+
+
+def get_inference_engine():
+    """获取配置中选择的推理引擎"""
+    configure_inference_threads()
+    return get_engine(
+        _identification_config["engine"],
+        num_threads=_identification_config["tf_intra_op_threads"] or None,
+    )
+
 
-    return label_with_category
+def predict_batch(batch):
+    """对一个批次 (N, 224, 224, 3) 执行一次前向推理，返回 (N, 37) 的概率"""
+    return get_inference_engine().predict(batch)
+
+
+# 多进程推理模式：工作进程各持有一份模型，输入经共享内存传递
+_process_pool = None
+if _identification_config["inference_mode"] == "process":
+    _process_pool = ProcessInferencePool(
+        _identification_config["engine"],
+        num_workers=_identification_config["process_workers"],
+        max_batch_size=_identification_config["max_batch_size"],
+        intra_op_threads=_identification_config["tf_intra_op_threads"],
+        inter_op_threads=_identification_config["tf_inter_op_threads"],
+    )
+
+_max_concurrent_batches = _process_pool.num_workers if _process_pool else 1
+# 执行批次推理的线程，与预处理线程分开，数量等于同时执行的批次数
+_inference_pool = ThreadPoolExecutor(
+    max_workers=_max_concurrent_batches, thread_name_prefix="inference"
+)
+
+# 动态批处理调度器：合并并发请求，一次前向推理处理整个批次
+_batch_scheduler = BatchScheduler(
+    _process_pool.predict if _process_pool else predict_batch,
+    executor=_inference_pool,
+    max_batch_size=_identification_config["max_batch_size"],
+    max_wait_ms=_identification_config["max_wait_ms"],
+    max_queue_size=_identification_config["max_queue_size"],
+    max_concurrent_batches=_max_concurrent_batches,
+)
+
+# 准入控制：限制同时处理的请求数，按用户公平排队，过载时快速拒绝
+_admission = AdmissionController(
+    max_concurrency=_identification_config["max_concurrency"],
+    max_queue_depth=_identification_config["admission_queue_size"],
+    max_estimated_wait_s=_identification_config["max_estimated_wait_s"],
+)
+
+
+def warm_up_inference():
+    """
+    加载推理引擎并用空白图像执行前向推理，
+    让单张与满批次两种输入形状在第一个真实请求之前完成图追踪
+    """
+    predict_fn = _process_pool.predict if _process_pool else predict_batch
+    for batch_size in sorted({1, _identification_config["max_batch_size"]}):
+        blank = np.zeros((batch_size, 224, 224, 3), dtype=np.float32)
+        if _process_pool:
+            # 每个工作进程都需要预热
+            list(_inference_pool.map(predict_fn, [blank] * _process_pool.num_workers))
+        else:
+            predict_fn(blank)
+
+
+def shutdown_inference():
+    """释放推理资源（多进程模式下关闭工作进程与共享内存）"""
+    if _process_pool is not None:
+        _process_pool.shutdown()
 
 
 def identify_eye(image_path: Path, threshold: float = 0.1) -> tuple:
@@ -146,31 +141,88 @@ def identify_eye(image_path: Path, threshold: float = 0.1) -> tuple:
     Returns:
         predicted_categories_list: 预测的疾病种类列表
     """
-    label_with_category = predict_single_image(image_path)
-    filtered_results = [
-        item for item in label_with_category if item["probability"] >= threshold
-    ]
+    preprocessed = load_and_preprocess_image(image_path)
+    return postprocess_single(predict_batch(preprocessed)[0], threshold)
+
+
+def get_preprocess_tag() -> str:
+    """预处理方式标识，预处理方式会改变模型输入，不同方式的结果不共享缓存"""
+    tag = ""
+    if _identification_config["reduced_decode"]:
+        tag += "-r"
+    if _identification_config["fundus_crop"]:
+        tag += f"-c{_identification_config['fundus_crop_threshold']}"
+    return tag
+
+
+def get_model_version(engine: Optional[str] = None) -> str:
+    """识别模型（含推理引擎和预处理方式）的版本号，用于结果缓存的键，默认为配置的引擎"""
+    engine = engine or _identification_config["engine"]
+    return engine_version(engine) + get_preprocess_tag()
+
+
+def get_admission_stats() -> dict:
+    """准入控制与批处理队列的统计信息"""
+    return {**_admission.stats(), "batch_queue_depth": _batch_scheduler.queue_depth}
+
+
+async def predict_probabilities_async(
+    image: ImageSource, user_key: Hashable = None
+) -> np.ndarray:
+    """
+    异步推理单张图像，返回全部标签的概率向量
+
+    :param user_key: 公平排队所用的用户标识，同一用户的请求在同一队列中排队
+    :raises QueueFullError: 排队数或预计等待时间超过上限
+    """
+    async with _admission.slot(user_key):
+        # 在线程池中完成图像解码与预处理，避免阻塞事件循环
+        preprocessed = await asyncio.get_running_loop().run_in_executor(
+            _thread_pool, load_and_preprocess_image, image
+        )
+        # 交给批处理调度器，与其他并发请求合并为一次前向推理
+        return await _batch_scheduler.submit(preprocessed)
 
-    # 如果过滤后的结果为空，则至少保留一个概率最高的结果
-    if not filtered_results:
-        # 找出概率最高的一个结果
-        max_prob_item = max(label_with_category, key=lambda x: x["probability"])
-        filtered_results = [max_prob_item]
 
-    return sorted(filtered_results, key=lambda x: x["probability"], reverse=True)
+def _predict_with_activations(preprocessed: np.ndarray, layer_name: str):
+    return get_gradcam_engine(layer_name).forward(preprocessed)
 
 
-async def identify_eye_async(image_path: Path, threshold: float = 0.1) -> tuple:
+async def predict_with_activations_async(
+    image: ImageSource, user_key: Hashable = None, layer_name: str = "mixed10"
+) -> tuple:
+    """
+    异步推理单张图像并捕获 Grad-CAM 目标层激活（识别与 Grad-CAM 融合）
+
+    始终使用 Keras 模型单独前向推理，不经过批处理调度器；
+    返回的激活可直接用于计算热力图，无需再次解码图像与前向传播。
+
+    :return: (概率向量, (h, w, c) 目标层激活)
+    :raises QueueFullError: 排队数或预计等待时间超过上限
+    """
+    async with _admission.slot(user_key):
+        loop = asyncio.get_running_loop()
+        preprocessed = await loop.run_in_executor(
+            _thread_pool, load_and_preprocess_image, image
+        )
+        probabilities, activations = await loop.run_in_executor(
+            _inference_pool, _predict_with_activations, preprocessed, layer_name
+        )
+    return probabilities[0], activations[0]
+
+
+async def identify_eye_async(
+    image: ImageSource, threshold: float = 0.1, user_key: Hashable = None
+) -> tuple:
     """异步识别眼部疾病
 
     Args:
-        image_path (Path): 图像文件路径
+        image (ImageSource): 图像文件路径，或上传图像的原始字节（直接在内存中解码）
         threshold (float, optional): 置信值. Defaults to 0.1.
+        user_key (Hashable, optional): 公平排队所用的用户标识. Defaults to None.
 
     Returns:
         predicted_categories_list: 预测的疾病种类列表
     """
-    # 在线程池中运行CPU密集型任务，避免阻塞事件循环
-    return await asyncio.get_event_loop().run_in_executor(
-        _thread_pool, identify_eye, image_path, threshold
-    )
+    probabilities = await predict_probabilities_async(image, user_key)
+    return postprocess_single(probabilities, threshold)
@@ -0,0 +1,163 @@
+import struct
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+# 图像来源：文件路径或内存中的原始字节
+ImageSource = Union[str, Path, bytes, bytearray, memoryview]
+
+# 解析图像头部时从文件读取的最大字节数（EXIF 等元数据段最大为 64KB）
+HEADER_READ_BYTES = 256 * 1024
+
+# 带有图像尺寸的 JPEG 帧起始标记（SOF0-SOF15，不含 DHT/JPG/DAC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7}
+_JPEG_SOF_MARKERS |= {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 没有长度字段的 JPEG 标记
+_JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xDA)}
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# 按缩小倍数从大到小排列的降采样解码标志
+_REDUCED_COLOR_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def read_image(image: ImageSource, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """
+    读取图像为 BGR 数组
+
+    - 传入字节时直接用 cv2.imdecode 从内存缓冲区解码，不经过磁盘
+    - 传入路径时使用 cv2.imread 读取文件
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(image, dtype=np.uint8)
+        img_bgr = cv2.imdecode(buffer, flags) if buffer.size else None
+        if img_bgr is None:
+            raise ValueError("图像无法解码")
+        return img_bgr
+
+    img_bgr = cv2.imread(str(image), flags)
+    if img_bgr is None:
+        raise ValueError(f"图像无法读取: {image}")
+    return img_bgr
+
+
+def _jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """从 JPEG 的 SOF 段解析 (宽, 高)"""
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # 标记前允许有填充字节 0xFF
+            offset += 1
+            continue
+        if marker in _JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", data[offset + 2 : offset + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5 : offset + 9])
+            return width, height
+        if marker == 0xDA:
+            # 已到扫描数据，之后不会再有 SOF
+            return None
+        offset += 2 + length
+    return None
+
+
+def parse_image_size(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """
+    只根据文件头解析图像格式与尺寸，不解码像素
+
+    :param data: 图像开头的若干字节（JPEG 需要包含 SOF 段）
+    :return: ("jpeg" | "png", 宽, 高)，无法识别时返回 None
+    """
+    data = bytes(data[:HEADER_READ_BYTES])
+    if data.startswith(b"\xff\xd8"):
+        size = _jpeg_size(data)
+        return ("jpeg", *size) if size else None
+    if data.startswith(_PNG_SIGNATURE) and data[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+    return None
+
+
+def _read_header(image: ImageSource) -> bytes:
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image[:HEADER_READ_BYTES])
+    try:
+        with open(image, "rb") as f:
+            return f.read(HEADER_READ_BYTES)
+    except OSError:
+        return b""
+
+
+def reduced_decode_flags(width: int, height: int, target_size: int) -> int:
+    """
+    选择降采样解码标志：在短边缩小后仍不小于目标尺寸的前提下取最大的缩小倍数
+
+    JPEG 解码器可以在 DCT 阶段直接输出 1/2、1/4、1/8 尺寸，
+    比解码全分辨率后再缩放快得多，且内存峰值按倍数平方下降。
+    """
+    for factor, flags in _REDUCED_COLOR_FLAGS:
+        if min(width, height) // factor >= target_size:
+            return flags
+    return cv2.IMREAD_COLOR
+
+
+def crop_fundus(img_bgr: np.ndarray, threshold: int = 10) -> np.ndarray:
+    """
+    裁剪到眼底圆形区域的外接矩形，去掉四周的黑色边框
+
+    亮度高于阈值的像素超过该行（列）1% 的行列视为眼底区域，
+    可以忽略黑边中的 JPEG 噪点；找不到合理区域时返回原图。
+    """
+    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    mask = gray > threshold
+    height, width = mask.shape
+    rows = np.flatnonzero(mask.sum(axis=1) > width * 0.01)
+    cols = np.flatnonzero(mask.sum(axis=0) > height * 0.01)
+    if rows.size == 0 or cols.size == 0:
+        return img_bgr
+
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = cols[0], cols[-1] + 1
+    # 区域过小通常说明不是眼底图像，保持原图
+    if (bottom - top) < height * 0.1 or (right - left) < width * 0.1:
+        return img_bgr
+    return img_bgr[top:bottom, left:right]
+
+
+def read_fundus_image(
+    image: ImageSource,
+    target_size: int = 224,
+    reduced_decode: bool = True,
+    crop: bool = True,
+    crop_threshold: int = 10,
+) -> np.ndarray:
+    """
+    读取眼底图像为 BGR 数组，供缩放到模型输入尺寸前使用
+
+    - reduced_decode: 根据 JPEG 头部尺寸选择降采样解码，输出短边不小于 target_size
+    - crop: 在（降采样后的）图像上裁剪到眼底区域
+    """
+    flags = cv2.IMREAD_COLOR
+    if reduced_decode:
+        header = parse_image_size(_read_header(image))
+        # 只有 JPEG 解码器原生支持降采样，其他格式仍会先完整解码
+        if header is not None and header[0] == "jpeg":
+            flags = reduced_decode_flags(header[1], header[2], target_size)
+
+    img_bgr = read_image(image, flags)
+    if crop:
+        img_bgr = crop_fundus(img_bgr, crop_threshold)
+    return img_bgr
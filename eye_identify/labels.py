@@ -0,0 +1,99 @@
+from utils.get_details_by_disease_name import disease2details
+
+# ========== 2. 定义类别名称 ==========
+label_names = [
+    "branch retinal vein occlusion",  # O
+    "cataract",  # C
+    "central retinal vein occlusion",  # O
+    "chorioretinal atrophy",  # O
+    "diabetic retinopathy",  # D
+    "drusen",  # O
+    "dry age-related macular degeneration",  # A
+    "epiretinal membrane",  # O
+    "epiretinal membrane over the macula",  # O
+    "glaucoma",  # G
+    "hypertensive retinopathy",  # H
+    "laser spot",  # O
+    "lens dust",  # None
+    "macular epiretinal membrane",  # O
+    "maculopathy",  # O
+    "mild nonproliferative retinopathy",  # D
+    "moderate non proliferative retinopathy",  # D
+    "myelinated nerve fibers",  # O
+    "myopia retinopathy",  # M
+    "normal fundus",  # N
+    "optic disc edema",  # O
+    "pathological myopia",  # M
+    "peripapillary atrophy",  # O
+    "post laser photocoagulation",  # O
+    "post retinal laser surgery",  # O
+    "proliferative diabetic retinopathy",  # D
+    "refractive media opacity",  # O
+    "retinal pigmentation",  # O
+    "retinitis pigmentosa",  # O
+    "severe nonproliferative retinopathy",  # D
+    "severe proliferative diabetic retinopathy",  # D
+    "spotted membranous change",  # O
+    "suspected glaucoma",  # G
+    "tessellated fundus",  # O
+    "vitreous degeneration",  # O
+    "wet age-related macular degeneration",  # A
+    "white vessel",  # O
+]
+
+# ========== 2.1 标签类别字典 ==========
+label_categories = [
+    "O",
+    "C",
+    "O",
+    "O",
+    "D",
+    "O",
+    "A",
+    "O",
+    "O",
+    "G",
+    "H",
+    "O",
+    None,
+    "O",
+    "O",
+    "D",
+    "D",
+    "O",
+    "M",
+    "N",
+    "O",
+    "M",
+    "O",
+    "O",
+    "O",
+    "D",
+    "O",
+    "O",
+    "O",
+    "D",
+    "D",
+    "O",
+    "G",
+    "O",
+    "O",
+    "A",
+    "O",
+]
+
+# 将标签名和对应的类别映射成字典
+label_to_category = {name: cat for name, cat in zip(label_names, label_categories)}
+
+
+# ========== 2.2 预先连接的标签表 ==========
+# 按模型输出下标排列，每项已连接标签名、类别和疾病详情，
+# 后处理时直接按下标取用，无需逐标签查询详情
+label_table = [
+    {
+        "label": name,
+        "category": category,
+        "details": disease2details.get(name),
+    }
+    for name, category in zip(label_names, label_categories)
+]
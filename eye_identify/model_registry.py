@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# 默认模型文件路径
+DEFAULT_MODEL_PATH = Path(__file__).parent / "model.h5"
+
+
+def _file_version(path: Path) -> str:
+    """以模型文件内容的 SHA-256 前12位作为模型版本号"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()[:12]
+
+
+def _weights_nbytes(model) -> int:
+    """统计模型全部权重占用的字节数"""
+    total = 0
+    for weight in model.weights:
+        dtype = getattr(weight.dtype, "as_numpy_dtype", weight.dtype)
+        total += int(np.prod(weight.shape)) * np.dtype(dtype).itemsize
+    return total
+
+
+class LoadedModel:
+    """已加载到内存中的模型及其元数据"""
+
+    def __init__(self, name: str, path: Path, model, load_time: float):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.load_time = load_time
+        self.memory_bytes = _weights_nbytes(model)
+        self.version = _file_version(path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "version": self.version,
+            "load_time_seconds": round(self.load_time, 3),
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+class ModelRegistry:
+    """
+    进程级模型注册表
+
+    每个模型只加载一次，识别与 Grad-CAM 共享同一份常驻权重。
+    """
+
+    def __init__(self):
+        self._paths: Dict[str, Path] = {}
+        self._models: Dict[str, LoadedModel] = {}
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path: Path) -> None:
+        """注册模型名称与文件路径（不会立即加载）"""
+        with self._lock:
+            self._paths[name] = Path(path)
+
+    def _resolve_name(self, name: Optional[str], path: Optional[Path]) -> str:
+        if path is None:
+            return name or "default"
+        # 通过路径获取的模型以绝对路径作为名称注册
+        path = Path(path).resolve()
+        for registered_name, registered_path in self._paths.items():
+            if registered_path.resolve() == path:
+                return registered_name
+        self.register(str(path), path)
+        return str(path)
+
+    def get_loaded(
+        self, name: Optional[str] = None, path: Optional[Path] = None
+    ) -> LoadedModel:
+        """获取已加载的模型，首次访问时加载"""
+        name = self._resolve_name(name, path)
+        loaded = self._models.get(name)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            # 双重检查，避免并发请求重复加载
+            loaded = self._models.get(name)
+            if loaded is not None:
+                return loaded
+
+            if name not in self._paths:
+                raise KeyError(f"未注册的模型: {name}")
+            model_path = self._paths[name]
+
+            # 延迟导入 TensorFlow，避免拖慢应用启动
+            import tensorflow as tf
+
+            start = time.perf_counter()
+            model = tf.keras.models.load_model(model_path, compile=False)
+            loaded = LoadedModel(name, model_path, model, time.perf_counter() - start)
+            self._models[name] = loaded
+            return loaded
+
+    def get(self, name: Optional[str] = None, path: Optional[Path] = None):
+        """获取模型对象"""
+        return self.get_loaded(name, path).model
+
+    def version(self, name: Optional[str] = None) -> str:
+        """获取模型版本号（只计算文件哈希，不需要加载模型）"""
+        name = name or "default"
+        loaded = self._models.get(name)
+        if loaded is not None:
+            return loaded.version
+        if name not in self._versions:
+            self._versions[name] = _file_version(self._paths[name])
+        return self._versions[name]
+
+    def describe(self) -> list:
+        """返回所有已加载模型的加载耗时、内存占用和版本信息"""
+        return [loaded.to_dict() for loaded in self._models.values()]
+
+
+# 全局模型注册表
+model_registry = ModelRegistry()
+model_registry.register("default", DEFAULT_MODEL_PATH)
@@ -0,0 +1,50 @@
+from typing import Union
+
+import numpy as np
+
+from .labels import label_table
+
+
+def postprocess_batch(
+    probabilities: np.ndarray, thresholds: Union[float, np.ndarray] = 0.1
+) -> list:
+    """
+    将一个批次的概率矩阵转换为识别结果
+
+    对整个批次做向量化的排序与阈值过滤，每张图像只保留概率不低于阈值的标签
+    （按概率降序），全部低于阈值时保留概率最高的一个。
+
+    :param probabilities: (N, 37) 的概率矩阵
+    :param thresholds: 统一阈值，或长度为 N 的逐图像阈值
+    :return: 长度为 N 的列表，每项为 [{"label", "probability", "details"}, ...]
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    probabilities = probabilities.reshape(-1, probabilities.shape[-1])
+    thresholds = np.asarray(thresholds, dtype=np.float32).reshape(-1, 1)
+
+    # 稳定排序，概率相同时保持标签原始顺序
+    order = np.argsort(-probabilities, axis=1, kind="stable")
+    sorted_probs = np.take_along_axis(probabilities, order, axis=1)
+    # 降序排列后，满足阈值的标签构成前缀；至少保留概率最高的一个
+    keep_counts = np.maximum((sorted_probs >= thresholds).sum(axis=1), 1)
+
+    results = []
+    for row_order, row_probs, count in zip(
+        order.tolist(), sorted_probs.tolist(), keep_counts.tolist()
+    ):
+        results.append(
+            [
+                {
+                    "label": label_table[index]["label"],
+                    "probability": probability,
+                    "details": label_table[index]["details"],
+                }
+                for index, probability in zip(row_order[:count], row_probs[:count])
+            ]
+        )
+    return results
+
+
+def postprocess_single(probabilities: np.ndarray, threshold: float = 0.1) -> list:
+    """将单张图像的概率向量转换为识别结果"""
+    return postprocess_batch(np.asarray(probabilities)[None, :], threshold)[0]
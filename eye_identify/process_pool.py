@@ -0,0 +1,144 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 工作进程内常驻的推理引擎（每个进程各持有一份模型）
+_worker_engine = None
+
+
+def _init_worker(engine_name: str, intra_op_threads: int, inter_op_threads: int):
+    """工作进程初始化：设置 TF 线程预算并加载推理引擎"""
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+    from .engines import configure_tf_threads, create_engine
+
+    # 线程数必须在 TF 运行时初始化之前设置，0 表示使用 TF 默认值
+    configure_tf_threads(intra_op_threads, inter_op_threads)
+
+    global _worker_engine
+    _worker_engine = create_engine(engine_name, num_threads=intra_op_threads or None)
+
+
+def _worker_predict(shm_name: str, shape: tuple, dtype: str) -> np.ndarray:
+    """在工作进程中从共享内存读取输入张量并推理，只回传概率结果"""
+    # 共享内存由主进程创建和释放，工作进程只负责附加与关闭
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        batch = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        preds = _worker_engine.predict(batch)
+        del batch
+        return preds
+    finally:
+        shm.close()
+
+
+class ProcessInferencePool:
+    """
+    多进程推理池
+
+    N 个工作进程各持有一份推理引擎，输入张量通过预先分配的共享内存缓冲区传递，
+    不对大数组做 pickle，只回传 (N, 37) 的概率结果。
+    """
+
+    def __init__(
+        self,
+        engine_name: str = "keras",
+        num_workers: int = 2,
+        max_batch_size: int = 16,
+        input_shape: tuple = (224, 224, 3),
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+    ):
+        """
+        :param engine_name: 推理引擎名称（见 eye_identify.engines）
+        :param num_workers: 工作进程数
+        :param max_batch_size: 单个缓冲区可容纳的最大批大小
+        :param input_shape: 单张图像张量的形状
+        :param intra_op_threads: 每个工作进程的 TF 算子内并行线程数
+        :param inter_op_threads: 每个工作进程的 TF 算子间并行线程数
+        """
+        self.engine_name = engine_name
+        self.num_workers = max(1, num_workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.input_shape = tuple(input_shape)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        self._executor = None
+        self._slots: "queue.Queue[shared_memory.SharedMemory]" = queue.Queue()
+        self._all_slots = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        """惰性启动工作进程并分配共享内存缓冲区"""
+        if self._executor is not None:
+            return
+        with self._lock:
+            if self._executor is not None:
+                return
+
+            slot_size = (
+                self.max_batch_size
+                * int(np.prod(self.input_shape))
+                * np.dtype(np.float32).itemsize
+            )
+            # 每个工作进程两个缓冲区，使下一批的写入与当前批的推理重叠
+            for _ in range(self.num_workers * 2):
+                shm = shared_memory.SharedMemory(create=True, size=slot_size)
+                self._all_slots.append(shm)
+                self._slots.put(shm)
+
+            # 使用 spawn 避免 fork 带入父进程的 TF 运行时状态
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(
+                    self.engine_name,
+                    self.intra_op_threads,
+                    self.inter_op_threads,
+                ),
+            )
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """同步推理一个批次（在线程中调用，阻塞直到工作进程返回）"""
+        self._ensure_started()
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+
+        # 超过缓冲区容量的批次拆分处理
+        if len(batch) > self.max_batch_size:
+            return np.concatenate(
+                [
+                    self.predict(batch[i : i + self.max_batch_size])
+                    for i in range(0, len(batch), self.max_batch_size)
+                ],
+                axis=0,
+            )
+
+        shm = self._slots.get()
+        try:
+            view = np.ndarray(batch.shape, dtype=batch.dtype, buffer=shm.buf)
+            view[:] = batch
+            del view
+            future = self._executor.submit(
+                _worker_predict, shm.name, batch.shape, batch.dtype.str
+            )
+            return future.result()
+        finally:
+            self._slots.put(shm)
+
+    def shutdown(self) -> None:
+        """关闭工作进程并释放共享内存"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            for shm in self._all_slots:
+                shm.close()
+                shm.unlink()
+            self._all_slots = []
+            self._slots = queue.Queue()
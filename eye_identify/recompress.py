@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+
+import cv2
+
+from .image_io import ImageSource, read_image
+from .thumbnails import ENCODE_FORMATS, resize_long_side
+
+
+@dataclass
+class RecompressedImage:
+    """重新编码后的图像及处理前后的尺寸"""
+
+    data: bytes
+    extension: str
+    width: int
+    height: int
+    original_width: int
+    original_height: int
+
+
+def recompress_image(
+    image: ImageSource, max_side: int, fmt: str = "webp", quality: int = 90
+) -> RecompressedImage:
+    """
+    将上传的原图缩小并重新编码（阻塞操作，应在线程中执行）
+
+    长边超过 max_side 时等比缩小，不放大；max_side 应远大于模型输入尺寸，
+    保证之后的Grad-CAM与人工阅片不受影响。
+
+    :param image: 图像文件路径或原始字节
+    :param max_side: 长边像素上限
+    :param fmt: 编码格式，webp 或 jpeg
+    :param quality: 编码质量
+    """
+    img_bgr = read_image(image)
+    original_height, original_width = img_bgr.shape[:2]
+    img_bgr = resize_long_side(img_bgr, max_side)
+
+    extension, quality_flag = ENCODE_FORMATS[fmt]
+    ok, encoded = cv2.imencode(extension, img_bgr, [quality_flag, quality])
+    if not ok:
+        raise ValueError("图像重新编码失败")
+    height, width = img_bgr.shape[:2]
+    return RecompressedImage(
+        data=encoded.tobytes(),
+        extension=extension,
+        width=width,
+        height=height,
+        original_width=original_width,
+        original_height=original_height,
+    )
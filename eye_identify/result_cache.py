@@ -0,0 +1,152 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from Config import Config
+from models.IdentificationCache import IdentificationCache
+
+
+class ResultCache:
+    """
+    内容寻址的识别结果缓存
+
+    一级为进程内 LRU，二级为数据库表，均以 (图像SHA-256, 模型版本) 为键，
+    缓存的是完整的概率向量，阈值在命中后重新应用。
+    """
+
+    def __init__(self, memory_entries: int = 1024, db_entries: int = 100000):
+        """
+        :param memory_entries: 进程内 LRU 最多保存的条目数
+        :param db_entries: 数据库表最多保存的条目数，超出后淘汰最久未命中的记录
+        """
+        self.memory_entries = memory_entries
+        self.db_entries = db_entries
+
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_prune = 0
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: tuple, probabilities: np.ndarray) -> None:
+        """写入进程内 LRU，超出预算时淘汰最久未使用的条目"""
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = probabilities
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(
+        self, db: Session, image_hash: str, model_version: str
+    ) -> Optional[np.ndarray]:
+        """查询缓存，命中时返回概率向量，未命中返回None"""
+        key = (image_hash, model_version)
+        with self._lock:
+            probabilities = self._memory.get(key)
+            if probabilities is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return probabilities
+
+        record = (
+            db.query(IdentificationCache)
+            .filter(
+                IdentificationCache.image_hash == image_hash,
+                IdentificationCache.model_version == model_version,
+            )
+            .first()
+        )
+        if record is None:
+            self.misses += 1
+            return None
+
+        record.hit_count = (record.hit_count or 0) + 1
+        record.last_hit_at = datetime.now()
+        db.commit()
+
+        probabilities = np.asarray(json.loads(record.probabilities), dtype=np.float32)
+        self._remember(key, probabilities)
+        self.db_hits += 1
+        return probabilities
+
+    def put(
+        self,
+        db: Session,
+        image_hash: str,
+        model_version: str,
+        probabilities: np.ndarray,
+    ) -> None:
+        """写入两级缓存"""
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        self._remember((image_hash, model_version), probabilities)
+
+        db.add(
+            IdentificationCache(
+                image_hash=image_hash,
+                model_version=model_version,
+                probabilities=json.dumps(probabilities.tolist()),
+            )
+        )
+        try:
+            db.commit()
+        except IntegrityError:
+            # 相同图像被并发识别，另一请求已写入
+            db.rollback()
+            return
+
+        # 每写入一定数量后检查一次数据库预算，避免每次写入都统计表大小
+        self._puts_since_prune += 1
+        if self._puts_since_prune >= 100:
+            self._puts_since_prune = 0
+            self.prune(db)
+
+    def prune(self, db: Session) -> int:
+        """按最近命中时间淘汰超出数据库预算的记录，返回删除的条数"""
+        total = db.query(IdentificationCache).count()
+        overflow = total - self.db_entries
+        if overflow <= 0:
+            return 0
+
+        stale_ids = [
+            row.id
+            for row in db.query(IdentificationCache.id)
+            .order_by(IdentificationCache.last_hit_at.asc())
+            .limit(overflow)
+        ]
+        db.query(IdentificationCache).filter(
+            IdentificationCache.id.in_(stale_ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return len(stale_ids)
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.memory_hits + self.db_hits) / lookups if lookups else 0.0
+            ),
+            "memory_entries": len(self._memory),
+            "memory_budget": self.memory_entries,
+            "db_budget": self.db_entries,
+        }
+
+
+# 全局识别结果缓存
+result_cache = ResultCache(
+    memory_entries=Config.CACHE_CONFIG["result_memory_entries"],
+    db_entries=Config.CACHE_CONFIG["result_db_entries"],
+)
@@ -0,0 +1,104 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Union
+
+import cv2
+import numpy as np
+
+from Config import Config
+
+from .image_io import read_fundus_image
+
+_thumbnail_config = Config.THUMBNAIL_CONFIG
+
+# 格式 -> (扩展名, OpenCV 编码质量参数)
+ENCODE_FORMATS = {
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+}
+
+# 后台生成缩略图的线程池，与识别、Grad-CAM 所用线程池分开
+_thumbnail_pool = ThreadPoolExecutor(
+    max_workers=_thumbnail_config["workers"], thread_name_prefix="thumbnail"
+)
+
+
+def thumbnail_path(image_path: Union[str, Path], size: int, fmt: str) -> Path:
+    """缩略图与原图存放在同一目录：{原文件名}_{长边}{扩展名}"""
+    image_path = Path(image_path)
+    extension, _ = ENCODE_FORMATS[fmt]
+    return image_path.with_name(f"{image_path.stem}_{size}{extension}")
+
+
+def resize_long_side(img_bgr: np.ndarray, size: int) -> np.ndarray:
+    """缩放到长边为 size，不放大"""
+    height, width = img_bgr.shape[:2]
+    scale = size / max(height, width)
+    if scale >= 1:
+        return img_bgr
+    return cv2.resize(
+        img_bgr,
+        (max(1, round(width * scale)), max(1, round(height * scale))),
+        interpolation=cv2.INTER_AREA,
+    )
+
+
+def _write(img_bgr: np.ndarray, path: Path, fmt: str) -> None:
+    """编码并原子写入：先写临时文件再重命名，并发读取不会读到不完整的文件"""
+    extension, quality_flag = ENCODE_FORMATS[fmt]
+    ok, encoded = cv2.imencode(
+        extension, img_bgr, [quality_flag, _thumbnail_config["quality"]]
+    )
+    if not ok:
+        raise ValueError(f"缩略图编码失败: {path}")
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+    temp_path.write_bytes(encoded.tobytes())
+    os.replace(temp_path, path)
+
+
+def generate_thumbnails(image_path: Union[str, Path], sizes=None, formats=None) -> None:
+    """
+    生成原图的全部缩略图，已存在的跳过
+
+    只解码一次（按最大尺寸降采样解码），从大到小逐级缩放，
+    小尺寸由上一级缩放得到，避免每个尺寸都从原图缩放。
+    """
+    sizes = sorted(sizes or _thumbnail_config["sizes"], reverse=True)
+    formats = formats or _thumbnail_config["formats"]
+    missing = [
+        (size, fmt)
+        for size in sizes
+        for fmt in formats
+        if not thumbnail_path(image_path, size, fmt).exists()
+    ]
+    if not missing:
+        return
+
+    img_bgr = read_fundus_image(image_path, sizes[0], crop=False)
+    for size in sizes:
+        img_bgr = resize_long_side(img_bgr, size)
+        for fmt in formats:
+            if (size, fmt) in missing:
+                _write(img_bgr, thumbnail_path(image_path, size, fmt), fmt)
+
+
+def get_or_create_thumbnail(image_path: Union[str, Path], size: int, fmt: str) -> Path:
+    """返回缩略图路径，不存在时立即生成（阻塞操作，应在线程中执行）"""
+    path = thumbnail_path(image_path, size, fmt)
+    if not path.exists():
+        generate_thumbnails(image_path, [size], [fmt])
+    return path
+
+
+def submit_thumbnails(image_path: Union[str, Path]) -> None:
+    """在后台线程池中生成缩略图，失败时忽略（访问时会按需生成）"""
+    _thumbnail_pool.submit(generate_thumbnails, image_path)
+
+
+def remove_thumbnails(image_path: Union[str, Path]) -> None:
+    """删除原图的全部缩略图"""
+    for size in _thumbnail_config["sizes"]:
+        for fmt in ENCODE_FORMATS:
+            thumbnail_path(image_path, size, fmt).unlink(missing_ok=True)
@@ -0,0 +1,99 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class StartupReport:
+    """记录应用启动各阶段耗时与就绪状态"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self._created_at = time.perf_counter()
+        self._ready_at: Optional[float] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        """记录一个启动阶段的耗时"""
+        self.phases[name] = round(seconds, 3)
+
+    @contextmanager
+    def phase(self, name: str):
+        """计时上下文：with startup_report.phase("load_model"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self._ready_at = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "phases": self.phases,
+            "seconds_to_ready": (
+                round(self._ready_at - self._created_at, 3)
+                if self._ready_at is not None
+                else None
+            ),
+        }
+
+
+# 全局启动报告
+startup_report = StartupReport()
+
+
+def warm_up() -> None:
+    """
+    加载模型并预热（同步执行，应在后台线程中调用）
+
+    依次导入 TensorFlow、加载共享模型与推理引擎、执行一次识别前向推理
+    和一次 Grad-CAM 计算，全部完成后才标记为就绪。
+    """
+    from .gradcam_engine import get_gradcam_engine
+    from .identify import (
+        configure_inference_threads,
+        get_inference_engine,
+        get_model_version,
+        warm_up_inference,
+    )
+    from .model_registry import model_registry
+
+    try:
+        with startup_report.phase("import_tensorflow"):
+            import tensorflow  # noqa: F401
+
+            # 线程数需在加载模型（TF 运行时初始化）之前设置
+            configure_inference_threads()
+
+        with startup_report.phase("load_model"):
+            model_registry.get("default")
+            get_model_version()
+
+        with startup_report.phase("load_engine"):
+            get_inference_engine()
+
+        with startup_report.phase("warmup_inference"):
+            warm_up_inference()
+
+        with startup_report.phase("warmup_gradcam"):
+            # 构建并追踪默认目标层的各个 Grad-CAM 计算图
+            blank = np.zeros((1, 224, 224, 3), dtype=np.float32)
+            gradcam_engine = get_gradcam_engine("mixed10")
+            gradcam_engine.heatmap(blank)
+            gradcam_engine.class_heatmaps(blank, [0])
+            # 识别与 Grad-CAM 融合模式的前向与分类头梯度
+            _, activations = gradcam_engine.forward(blank)
+            gradcam_engine.heatmap_from_activations(activations[0], 0)
+
+        startup_report.mark_ready()
+    except Exception as e:
+        startup_report.error = str(e)
+        raise
@@ -0,0 +1,3 @@
+from .handlers import JOB_HANDLERS
+from .queue import add_job, enqueue_job
+from .worker import job_workers
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal
+from eye_identify import (
+    blend_heatmap_jpeg_async,
+    blend_heatmaps_jpeg_async,
+    get_or_compute_heatmaps,
+    label_names,
+    pack_gradcam_zip,
+)
+from models.EyeIdentification import EyeIdentification
+from storage import get_storage, recompress_object, resolve_image_path
+
+
+class JobError(Exception):
+    """任务参数或数据有误，重试也不会成功"""
+
+
+async def _get_record(db: AsyncSession, identification_id: int) -> tuple:
+    """返回识别记录与图像的本地路径"""
+    # 任务排队期间记录可能已被删除
+    record = await db.get(EyeIdentification, identification_id)
+    if record is None:
+        raise JobError("识别记录不存在")
+    try:
+        image_path = await asyncio.to_thread(resolve_image_path, record.image_path)
+    except FileNotFoundError:
+        raise JobError("图像文件不存在")
+    return record, image_path
+
+
+async def run_gradcam_job(db: AsyncSession, params: dict) -> Tuple[bytes, str, str]:
+    """为识别记录生成单个类别的Grad-CAM叠加图，返回 (内容, 媒体类型, 扩展名)"""
+    record, image_path = await _get_record(db, params["identification_id"])
+    class_index = params.get("class_index")
+    if class_index is None:
+        class_index = label_names.index(json.loads(record.results)[0]["label"])
+
+    (heatmap,) = await get_or_compute_heatmaps(
+        db, record.id, image_path, params["last_conv_layer_name"], [class_index]
+    )
+    image_jpeg = await blend_heatmap_jpeg_async(image_path, heatmap, params["alpha"])
+    return image_jpeg, "image/jpeg", "jpg"
+
+
+async def run_gradcam_labels_job(
+    db: AsyncSession, params: dict
+) -> Tuple[bytes, str, str]:
+    """为识别记录的多个标签生成Grad-CAM叠加图并打包为zip"""
+    record, image_path = await _get_record(db, params["identification_id"])
+    class_indices = params.get("class_indices")
+    if not class_indices:
+        class_indices = [
+            label_names.index(result["label"]) for result in json.loads(record.results)
+        ]
+
+    heatmaps = await get_or_compute_heatmaps(
+        db, record.id, image_path, params["last_conv_layer_name"], class_indices
+    )
+    images_jpeg = await blend_heatmaps_jpeg_async(image_path, heatmaps, params["alpha"])
+    return pack_gradcam_zip(class_indices, images_jpeg), "application/zip", "zip"
+
+
+def _recompress(key: str) -> dict:
+    db = SessionLocal()
+    try:
+        return recompress_object(db, get_storage(), key)
+    finally:
+        db.close()
+
+
+async def run_recompress_job(db: AsyncSession, params: dict) -> Tuple[bytes, str, str]:
+    """入库重压缩存储中的原图，返回JSON格式的处理报告"""
+    # 解码、编码、存储读写与数据库更新都在线程中完成，不阻塞事件循环
+    report = await asyncio.to_thread(_recompress, params["key"])
+    return json.dumps(report).encode(), "application/json", "json"
+
+
+# 任务类型 -> 处理函数
+JOB_HANDLERS = {
+    "gradcam": run_gradcam_job,
+    "gradcam_labels": run_gradcam_labels_job,
+    "recompress": run_recompress_job,
+}
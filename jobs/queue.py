@@ -0,0 +1,129 @@
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models.Job import Job, JobStatus
+
+
+def add_job(
+    db: Session, job_type: str, params: dict, user_id: Optional[int] = None
+) -> Job:
+    """创建待执行的任务（不提交事务），与调用方的其他写入在同一事务中提交"""
+    job = Job(job_type=job_type, params=params, user_id=user_id)
+    db.add(job)
+    return job
+
+
+def enqueue_job(
+    db: Session, job_type: str, params: dict, user_id: Optional[int] = None
+) -> Job:
+    """创建一个待执行的任务"""
+    job = add_job(db, job_type, params, user_id)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[Job]:
+    """
+    领取最早的待执行任务并标记为执行中，没有任务时返回None
+
+    PostgreSQL 使用 SELECT ... FOR UPDATE SKIP LOCKED，多个工作者（包括其他进程）
+    并发领取时互不阻塞；SQLite 不支持行锁，改为先读取候选任务，
+    再以带状态条件的 UPDATE 抢占，更新行数为0说明已被其他工作者领取。
+    """
+    query = db.query(Job).filter(Job.status == JobStatus.PENDING).order_by(Job.id)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+
+    job = query.first()
+    if job is None:
+        db.rollback()
+        return None
+
+    claimed = (
+        db.query(Job)
+        .filter(Job.id == job.id, Job.status == JobStatus.PENDING)
+        .update(
+            {
+                Job.status: JobStatus.RUNNING,
+                Job.started_at: datetime.now(),
+                Job.attempts: Job.attempts + 1,
+                Job.worker_id: worker_id,
+            },
+            synchronize_session=False,
+        )
+    )
+    if not claimed:
+        db.rollback()
+        return None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def complete_job(db: Session, job: Job, result: dict) -> None:
+    """标记任务成功并保存结果"""
+    job.status = JobStatus.SUCCEEDED
+    job.result = json.dumps(result)
+    job.finished_at = datetime.now()
+    db.commit()
+
+
+def fail_job(db: Session, job: Job, error: str) -> None:
+    """标记任务失败"""
+    job.status = JobStatus.FAILED
+    job.error = error
+    job.finished_at = datetime.now()
+    db.commit()
+
+
+def retry_job(db: Session, job: Job) -> None:
+    """将任务放回队列稍后重试（例如 Grad-CAM 线程池已满），不计入执行次数"""
+    job.status = JobStatus.PENDING
+    job.started_at = None
+    job.attempts = max(0, (job.attempts or 1) - 1)
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session, stale_after_s: float, max_attempts: int) -> int:
+    """
+    执行时间超过 stale_after_s 的任务视为工作者已退出：
+    未达到最大执行次数的重新排队，否则标记为失败。返回处理的任务数
+    """
+    deadline = datetime.now() - timedelta(seconds=stale_after_s)
+    stale_jobs = (
+        db.query(Job)
+        .filter(Job.status == JobStatus.RUNNING, Job.started_at < deadline)
+        .all()
+    )
+    for job in stale_jobs:
+        if (job.attempts or 0) >= max_attempts:
+            job.status = JobStatus.FAILED
+            job.error = "任务执行超时"
+            job.finished_at = datetime.now()
+        else:
+            job.status = JobStatus.PENDING
+            job.started_at = None
+    db.commit()
+    return len(stale_jobs)
+
+
+def purge_finished_jobs(db: Session, ttl_hours: float) -> list:
+    """删除结束超过 ttl_hours 的任务，返回它们的任务结果（用于清理结果文件）"""
+    deadline = datetime.now() - timedelta(hours=ttl_hours)
+    expired = (
+        db.query(Job)
+        .filter(
+            Job.status.in_([JobStatus.SUCCEEDED, JobStatus.FAILED]),
+            Job.finished_at < deadline,
+        )
+        .all()
+    )
+    results = [json.loads(job.result) for job in expired if job.result]
+    for job in expired:
+        db.delete(job)
+    db.commit()
+    return results
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import socket
+from pathlib import Path
+from typing import List, Optional
+
+from Config import Config
+from database import AsyncSessionLocal, SessionLocal
+from eye_identify import QueueFullError
+from models.Job import Job
+
+from .handlers import JOB_HANDLERS, JobError
+from .queue import (
+    claim_next_job,
+    complete_job,
+    fail_job,
+    purge_finished_jobs,
+    requeue_stale_jobs,
+    retry_job,
+)
+
+# 任务结果文件目录
+RESULT_DIR = Config.get_upload_dir() / "jobs"
+# 超时任务回收与过期任务清理的间隔（秒）
+_MAINTENANCE_INTERVAL_S = 60
+
+
+def result_path(job_id: int, extension: str) -> Path:
+    return RESULT_DIR / f"{job_id}.{extension}"
+
+
+class JobWorkerPool:
+    """
+    进程内的任务工作者
+
+    每个工作者是一个 asyncio 任务：从数据库队列领取任务，执行对应的处理函数，
+    结果写入文件后标记任务完成。队列持久化在数据库中，多个进程可以同时消费；
+    本进程内新建任务或任务结束时通过事件唤醒工作者与长轮询请求，
+    其他进程产生的变化则依靠定时轮询发现。
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval_s: float = 0.5,
+        stale_after_s: float = 600,
+        max_attempts: int = 3,
+        result_ttl_hours: float = 24,
+    ):
+        """
+        :param workers: 工作者数量
+        :param poll_interval_s: 队列为空时的轮询间隔（秒）
+        :param stale_after_s: 执行超过该时间的任务视为工作者已退出，重新排队
+        :param max_attempts: 单个任务的最大执行次数
+        :param result_ttl_hours: 已结束任务及其结果文件的保留时间（小时）
+        """
+        self.workers = workers
+        self.poll_interval_s = poll_interval_s
+        self.stale_after_s = stale_after_s
+        self.max_attempts = max_attempts
+        self.result_ttl_hours = result_ttl_hours
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._updated: Optional[asyncio.Event] = None
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        """在当前事件循环中启动工作者"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._updated = asyncio.Event()
+        RESULT_DIR.mkdir(parents=True, exist_ok=True)
+        self._tasks = [
+            asyncio.create_task(self._run(f"{self._worker_prefix}:{n}"))
+            for n in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        """停止工作者，执行中的任务由超时回收重新排队"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify_enqueued(self) -> None:
+        """有新任务入队，唤醒空闲的工作者"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _notify_updated(self) -> None:
+        # 替换事件对象，使之后的等待者等待下一次变化
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def wait_for_update(self, timeout: float) -> None:
+        """等待本进程内任意任务结束，最多等待 timeout 秒"""
+        if self._updated is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    def _claim(worker_id: str) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            job = claim_next_job(db, worker_id)
+            return job.id if job is not None else None
+        finally:
+            db.close()
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            job_id = await asyncio.to_thread(self._claim, worker_id)
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job_id)
+
+    async def _execute(self, job_id: int) -> None:
+        # 任务状态的读写使用异步会话，处理函数中的数据库操作也不阻塞事件循环
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job_id)
+                handler = JOB_HANDLERS.get(job.job_type)
+                if handler is None:
+                    await db.run_sync(
+                        fail_job, job, f"不支持的任务类型: {job.job_type}"
+                    )
+                    return
+
+                try:
+                    content, media_type, extension = await handler(
+                        db, json.loads(job.params)
+                    )
+                    path = result_path(job.id, extension)
+                    await asyncio.to_thread(path.write_bytes, content)
+                    await db.run_sync(
+                        complete_job,
+                        job,
+                        {
+                            "path": str(path),
+                            "media_type": media_type,
+                            "size": len(content),
+                        },
+                    )
+
+                except QueueFullError as e:
+                    # Grad-CAM 线程池已满，稍后重试
+                    await db.rollback()
+                    await db.run_sync(retry_job, job)
+                    await asyncio.sleep(e.retry_after)
+
+                except (JobError, ValueError) as e:
+                    # 记录已删除、图像无法解码或目标卷积层不存在
+                    await db.rollback()
+                    await db.run_sync(fail_job, job, str(e))
+
+                except Exception as e:
+                    await db.rollback()
+                    await db.run_sync(
+                        fail_job, job, f"任务执行过程中发生错误: {str(e)}"
+                    )
+
+        finally:
+            self._notify_updated()
+
+    def _maintenance(self) -> None:
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db, self.stale_after_s, self.max_attempts)
+            for result in purge_finished_jobs(db, self.result_ttl_hours):
+                Path(result["path"]).unlink(missing_ok=True)
+        finally:
+            db.close()
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.to_thread(self._maintenance)
+            await asyncio.sleep(_MAINTENANCE_INTERVAL_S)
+
+
+_jobs_config = Config.JOBS_CONFIG
+
+# 全局任务工作者
+job_workers = JobWorkerPool(
+    workers=_jobs_config["workers"],
+    poll_interval_s=_jobs_config["poll_interval_s"],
+    stale_after_s=_jobs_config["stale_after_s"],
+    max_attempts=_jobs_config["max_attempts"],
+    result_ttl_hours=_jobs_config["result_ttl_hours"],
+)
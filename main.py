@@ -1,3 +1,10 @@
+import time
+
+# 记录应用模块导入耗时（启动阶段之一）
+_import_start = time.perf_counter()
+
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 import uvicorn
@@ -7,21 +14,62 @@ from fastapi.staticfiles import StaticFiles
 
 from auth.auth_router import router as auth_router
 from Config import Config
-from database import init_db
+from database import async_engine, init_db
+from eye_identify import shutdown_inference, startup_report, warm_up
+from jobs import job_workers
+from routers.health_router import router as health_router
+from routers.identify_router import HEATMAP_HEADERS
 from routers.identify_router import router as identify_router
 from routers.introduce_router import router as disease_router
+from routers.jobs_router import router as jobs_router
+from routers.media_router import router as media_router
 from routers.users_router import router as users_router
+from utils import BodySizeLimitMiddleware
+
+startup_report.record("import_modules", time.perf_counter() - _import_start)
+
+logger = logging.getLogger(__name__)
+
+
+def _on_warmup_done(task: asyncio.Task) -> None:
+    """记录预热失败的异常，否则异常只会在任务被回收时以 "never retrieved" 输出"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        startup_report.error = str(error) or type(error).__name__
+        logger.error("模型加载与预热失败，服务保持未就绪状态", exc_info=error)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 初始化数据库
-    init_db()
+    with startup_report.phase("init_db"):
+        init_db()
+    # 模型加载与预热在后台线程中进行，期间 /health/live 可用、/health/ready 返回503
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    warmup_task.add_done_callback(_on_warmup_done)
+    app.state.warmup_task = warmup_task
+    # 启动后台任务工作者
+    job_workers.start()
     yield
+    # 预热尚未完成时停止等待（线程中的预热无法中断），并取回任务结果
+    warmup_task.cancel()
+    await asyncio.gather(warmup_task, return_exceptions=True)
+    await job_workers.stop()
+    # 关闭推理工作进程
+    shutdown_inference()
+    # 关闭异步引擎的连接池
+    await async_engine.dispose()
 
 
 app = FastAPI(title=Config.SERVER_CONFIG["title"], lifespan=lifespan)
 
+# 过大的请求体在接收之前即返回413
+app.add_middleware(
+    BodySizeLimitMiddleware, max_body_size=Config.UPLOAD_CONFIG["max_request_size"]
+)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -29,12 +77,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有HTTP方法
     allow_headers=["*"],  # 允许所有请求头
+    # 允许浏览器读取的响应头（重试间隔与原始热力图的尺寸等元数据）
+    expose_headers=["Retry-After", *HEATMAP_HEADERS],
 )
 
+app.include_router(health_router)
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(users_router, prefix="/api/v1")
 app.include_router(identify_router, prefix="/api/v1")
 app.include_router(disease_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
+app.include_router(media_router, prefix="/api/v1")
 
 # 静态文件目录
 app.mount(
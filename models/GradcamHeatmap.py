@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+)
+
+from database import Base
+
+
+class GradcamHeatmap(Base):
+    """Grad-CAM 热力图缓存表，按目标层分辨率存储归一化后的 uint8 热力图"""
+
+    # 表名
+    __tablename__ = "gradcam_heatmaps"
+    __table_args__ = (
+        UniqueConstraint(
+            "identification_id",
+            "layer_name",
+            "class_index",
+            "model_version",
+            name="uq_heatmap_key",
+        ),
+    )
+
+    # 表字段
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
+    identification_id = Column(
+        Integer,
+        ForeignKey("eye_identifications.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+        comment="识别记录ID",
+    )
+    layer_name = Column(String(32), nullable=False, comment="目标卷积层名称")
+    class_index = Column(Integer, nullable=False, comment="解释的类别索引")
+    model_version = Column(String(64), nullable=False, comment="模型版本")
+    height = Column(Integer, nullable=False, comment="热力图高度")
+    width = Column(Integer, nullable=False, comment="热力图宽度")
+    data = Column(LargeBinary, nullable=False, comment="uint8热力图原始字节")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+
+    def __init__(
+        self,
+        identification_id: int,
+        layer_name: str,
+        class_index: int,
+        model_version: str,
+        height: int,
+        width: int,
+        data: bytes,
+    ):
+        self.identification_id = identification_id
+        self.layer_name = layer_name
+        self.class_index = class_index
+        self.model_version = model_version
+        self.height = height
+        self.width = width
+        self.data = data
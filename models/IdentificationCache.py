@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+
+from database import Base
+
+
+class IdentificationCache(Base):
+    """识别结果缓存表，按图像内容哈希与模型版本存储概率向量"""
+
+    # 表名
+    __tablename__ = "identification_cache"
+    __table_args__ = (
+        UniqueConstraint("image_hash", "model_version", name="uq_cache_hash_version"),
+    )
+
+    # 表字段
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
+    image_hash = Column(String(64), nullable=False, index=True, comment="图像SHA-256")
+    model_version = Column(String(64), nullable=False, comment="模型版本")
+    probabilities = Column(Text, nullable=False, comment="JSON格式的概率向量")
+    hit_count = Column(Integer, default=0, comment="命中次数")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    last_hit_at = Column(
+        DateTime, default=datetime.now, index=True, comment="最近命中时间"
+    )
+
+    def __init__(self, image_hash: str, model_version: str, probabilities: str):
+        self.image_hash = image_hash
+        self.model_version = model_version
+        self.probabilities = probabilities
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy import Enum as SQLAEnum
+
+from database import Base
+
+
+class JobStatus(str, Enum):
+    """任务状态枚举"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+def _milliseconds(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds() * 1000, 1)
+
+
+class Job(Base):
+    """后台任务实体类，持久化的任务队列"""
+
+    # 表名
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_id", "status", "id"),)
+
+    # 表字段
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="任务ID")
+    job_type = Column(String(32), nullable=False, comment="任务类型")
+    status = Column(
+        SQLAEnum(JobStatus),
+        nullable=False,
+        default=JobStatus.PENDING,
+        comment="任务状态",
+    )
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="用户ID")
+    params = Column(Text, nullable=False, comment="JSON格式的任务参数")
+    result = Column(Text, nullable=True, comment="JSON格式的任务结果")
+    error = Column(Text, nullable=True, comment="失败原因")
+    attempts = Column(Integer, default=0, comment="执行次数")
+    worker_id = Column(String(64), nullable=True, comment="执行任务的工作者")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+
+    def __init__(self, job_type: str, params: dict, user_id: int = None):
+        self.job_type = job_type
+        self.params = json.dumps(params)
+        self.user_id = user_id
+        self.status = JobStatus.PENDING
+        self.attempts = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status.value,
+            "params": json.loads(self.params),
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            # 排队等待与执行耗时（毫秒）
+            "queue_wait_ms": _milliseconds(
+                self.created_at, self.started_at or datetime.now()
+            ),
+            "execution_ms": _milliseconds(self.started_at, self.finished_at),
+        }
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+
+from database import Base
+
+
+class StoredObject(Base):
+    """按内容寻址存储的图像对象及其引用计数，引用归零时删除对象"""
+
+    # 表名
+    __tablename__ = "stored_objects"
+
+    # 表字段
+    key = Column(String(128), primary_key=True, comment="存储键，由内容哈希生成")
+    size = Column(BigInteger, nullable=False, comment="字节数")
+    ref_count = Column(Integer, nullable=False, default=0, comment="引用次数")
+    width = Column(Integer, nullable=True, comment="图像宽度")
+    height = Column(Integer, nullable=True, comment="图像高度")
+    # 入库重压缩前上传的原图信息，为空表示尚未经过重压缩处理
+    original_size = Column(BigInteger, nullable=True, comment="原图字节数")
+    original_width = Column(Integer, nullable=True, comment="原图宽度")
+    original_height = Column(Integer, nullable=True, comment="原图高度")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    processed_at = Column(DateTime, nullable=True, comment="重压缩处理时间")
+
+    def __init__(self, key: str, size: int, ref_count: int = 0):
+        self.key = key
+        self.size = size
+        self.ref_count = ref_count
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {
+            "key": self.key,
+            "size": self.size,
+            "ref_count": self.ref_count,
+            "width": self.width,
+            "height": self.height,
+            "original_size": self.original_size,
+            "original_width": self.original_width,
+            "original_height": self.original_height,
+            "created_at": self.created_at.isoformat(),
+            "processed_at": (
+                self.processed_at.isoformat() if self.processed_at else None
+            ),
+        }
@@ -1,6 +1,19 @@
 from .EyeIdentification import EyeIdentification
+from .GradcamHeatmap import GradcamHeatmap
+from .IdentificationCache import IdentificationCache
 from .IdentifySuggestions import IdentifySuggestions
+from .Job import Job
+from .StoredObject import StoredObject
 from .UserRating import UserRating
 from .Users import Users
 
-__all__ = ["Users", "EyeIdentification", "UserRating", "IdentifySuggestions"]
+__all__ = [
+    "Users",
+    "EyeIdentification",
+    "UserRating",
+    "IdentifySuggestions",
+    "IdentificationCache",
+    "GradcamHeatmap",
+    "Job",
+    "StoredObject",
+]
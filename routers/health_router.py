@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from database import get_pool_stats
+from eye_identify import startup_report
+
+router = APIRouter(
+    prefix="/health",
+    tags=["健康检查"],
+)
+
+
+@router.get("/live", summary="存活探针")
+async def liveness():
+    """
+    进程存活即返回200，不依赖模型是否加载完成
+    """
+    return {"status": "alive"}
+
+
+@router.get("/ready", summary="就绪探针")
+async def readiness():
+    """
+    模型加载与预热完成后返回200，否则返回503（预热失败时 status 为 failed）；
+    同时返回各启动阶段耗时
+    """
+    report = startup_report.to_dict()
+    if not startup_report.ready:
+        state = "failed" if startup_report.error else "starting"
+        return JSONResponse(status_code=503, content={"status": state, **report})
+    return {"status": "ready", **report}
+
+
+@router.get("/db", summary="数据库连接池统计")
+async def database_pool_stats():
+    """
+    同步与异步引擎的连接池占用，以及取连接的平均、p95、最大耗时与超时次数
+    """
+    return get_pool_stats()
@@ -1,26 +1,91 @@
+import asyncio
+import base64
+import hashlib
+import io
 import json
 import os
-import shutil
-import uuid
+import zipfile
 from datetime import datetime
-from tempfile import NamedTemporaryFile
-from typing import Optional
-
-import cv2
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from fastapi.responses import FileResponse, Response
+from email.utils import formatdate
+from pathlib import Path
+from typing import Literal, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from auth.auth_handler import get_current_user
 from Config import Config
-from database import get_db
+from database import AsyncSessionLocal, get_async_db, get_db
 from entity.Order import Order
-from eye_identify import generate_gradcam, identify_eye_async
+from eye_identify import (
+    GRADCAM_LAYERS,
+    QueueFullError,
+    blend_heatmap_jpeg_async,
+    blend_heatmaps_jpeg_async,
+    compute_heatmap_async,
+    generate_gradcam_jpeg_async,
+    get_admission_stats,
+    get_gradcam_model_version,
+    get_model_version,
+    get_or_compute_heatmaps,
+    get_or_create_thumbnail,
+    heatmap_cache,
+    heatmap_from_activations_async,
+    label_names,
+    model_registry,
+    pack_gradcam_zip,
+    postprocess_single,
+    predict_probabilities_async,
+    predict_with_activations_async,
+    result_cache,
+    submit_thumbnails,
+)
+from eye_identify.image_io import parse_image_size
+from jobs import add_job, job_workers
 from models.EyeIdentification import EyeIdentification
 from models.IdentifySuggestions import IdentifySuggestions
 from models.Users import Gender, Users
-from utils import get_details_by_disease_name, get_disease_suggested_from_model
+from storage import (
+    add_reference,
+    content_key,
+    delete_image,
+    direct_image_url,
+    get_storage,
+    is_content_key,
+    key_sha256,
+    release_image,
+    resolve_image_path,
+    storage_report,
+)
+from utils import (
+    ImageFileInfo,
+    build_image_file_info,
+    get_disease_suggested_from_model,
+    image_file_cache,
+    is_not_modified,
+    read_image_upload,
+    read_upload,
+    validate_image_bytes,
+)
 
 router = APIRouter(
     prefix="/identify",
@@ -33,6 +98,198 @@ UPLOAD_DIR = Config.get_upload_dir()
 # 确保目录存在
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# 图像格式 -> 存储扩展名
+IMAGE_EXTENSIONS = {"jpeg": ".jpg", "png": ".png"}
+
+
+def new_image_key(image_bytes: bytes, image_hash: str, filename: str) -> str:
+    """上传图像的存储键：由内容哈希生成，扩展名取自图像头，无法识别时取自文件名"""
+    parsed = parse_image_size(image_bytes)
+    if parsed is not None:
+        extension = IMAGE_EXTENSIONS[parsed[0]]
+    else:
+        extension = os.path.splitext(filename or "")[1]
+    return content_key(image_hash, extension)
+
+
+def load_image_file_info(image_path: str) -> ImageFileInfo:
+    """
+    识别记录图像的文件信息（阻塞操作，远程存储会下载到本地缓存）
+
+    内容寻址的图像直接使用存储键中的哈希作为ETag，无需读取文件计算
+    """
+    sha256 = key_sha256(image_path) if is_content_key(image_path) else None
+    return build_image_file_info(str(resolve_image_path(image_path)), sha256)
+
+
+def is_cached_image_current(info: ImageFileInfo, image_path: str) -> bool:
+    """缓存的文件信息是否仍对应识别记录当前的图像，且文件仍然存在"""
+    if is_content_key(image_path):
+        current = info.etag == f'"{key_sha256(image_path)}"'
+    else:
+        current = info.path == image_path
+    return current and os.path.exists(info.path)
+
+
+async def predict_with_cache(
+    db: AsyncSession,
+    image_bytes: bytes,
+    image_hash: str,
+    model_version: str,
+    user_key=None,
+):
+    """先按图像内容哈希查询结果缓存，未命中时再执行推理并写入缓存"""
+    probabilities = await db.run_sync(result_cache.get, image_hash, model_version)
+    if probabilities is None:
+        # 结束只读事务，推理期间不占用数据库连接
+        await db.commit()
+        probabilities = await predict_probabilities_async(image_bytes, user_key)
+        await db.run_sync(result_cache.put, image_hash, model_version, probabilities)
+    return probabilities
+
+
+# zip 中被视为图像的扩展名
+ZIP_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+async def predict_fused_with_cache(
+    db: AsyncSession, image_bytes: bytes, image_hash: str, user_key=None
+):
+    """
+    识别与 Grad-CAM 融合：推理时同时捕获目标层激活
+
+    融合推理始终使用 Keras 模型，结果按 Keras 引擎的版本缓存。
+    返回 (概率向量, 目标层激活)，命中结果缓存时激活为 None。
+    """
+    model_version = get_model_version("keras")
+    probabilities = await db.run_sync(result_cache.get, image_hash, model_version)
+    if probabilities is not None:
+        return probabilities, None
+    await db.commit()
+    probabilities, activations = await predict_with_activations_async(
+        image_bytes, user_key
+    )
+    await db.run_sync(result_cache.put, image_hash, model_version, probabilities)
+    return probabilities, activations
+
+
+async def precompute_heatmap(
+    identification_id: int, class_index: int, activations, image_path: str
+) -> None:
+    """
+    后台生成识别记录的默认热力图（mixed10）并写入热力图缓存
+
+    有识别时捕获的激活时只需计算分类头的梯度，否则从图像完整计算
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            if activations is not None:
+                heatmap = await heatmap_from_activations_async(activations, class_index)
+            else:
+                heatmap, _ = await compute_heatmap_async(
+                    image_path, "mixed10", class_index
+                )
+            await db.run_sync(
+                heatmap_cache.put,
+                identification_id,
+                "mixed10",
+                class_index,
+                get_gradcam_model_version(),
+                heatmap,
+            )
+        except Exception:
+            # 预计算失败不影响识别结果，之后的Grad-CAM请求会重新计算
+            await db.rollback()
+
+
+def expand_zip_images(zip_bytes: bytes, max_files: int, max_file_size: int) -> list:
+    """
+    解压 zip 中的图像文件，返回 [(文件名, 字节), ...]
+
+    只读取扩展名为图像的条目，目录、隐藏文件和其他文件被忽略；
+    条目数或单个条目解压后大小超过限制时抛出 ValueError。
+    """
+    images = []
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith("."):
+                continue
+            if os.path.splitext(name)[1].lower() not in ZIP_IMAGE_EXTENSIONS:
+                continue
+            if len(images) >= max_files:
+                raise ValueError(f"图像数量超过上限{max_files}张")
+            if info.file_size > max_file_size:
+                raise ValueError(f"{name} 超过单张图像大小上限")
+            images.append((name, archive.read(info)))
+    return images
+
+
+def schedule_recompression(db: AsyncSession, image_keys) -> None:
+    """
+    入库重压缩开启时，为上传的图像创建后台重压缩任务（不提交事务）
+
+    任务与识别记录在同一事务中提交，进程退出也不会丢失
+    """
+    if not Config.RECOMPRESS_CONFIG["enabled"]:
+        return
+    for image_key in image_keys:
+        add_job(db, "recompress", {"key": image_key})
+
+
+def notify_recompression() -> None:
+    """事务提交后唤醒任务工作者"""
+    if Config.RECOMPRESS_CONFIG["enabled"]:
+        job_workers.notify_enqueued()
+
+
+def fair_queue_key(current_user: Optional[Users]):
+    """推理公平排队的用户标识，未登录请求共用一个队列"""
+    return current_user.id if current_user else None
+
+
+def check_gradcam_layer(last_conv_layer_name: str) -> None:
+    """目标卷积层必须是预设的层之一，每个层对应一个常驻的 Grad-CAM 计算图"""
+    if last_conv_layer_name not in GRADCAM_LAYERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"last_conv_layer_name参数必须是{', '.join(GRADCAM_LAYERS)}之一",
+        )
+
+
+async def get_gradcam_record(
+    db: AsyncSession, identification_id: int, current_user: Optional[Users]
+) -> Tuple[EyeIdentification, Path]:
+    """查询用于生成Grad-CAM的识别记录，检查访问权限，返回记录与图像的本地路径"""
+    # 查询特定的识别记录
+    record = await db.get(EyeIdentification, identification_id)
+
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="识别记录不存在",
+        )
+
+    # 检查权限：如果记录属于某个用户，只有该用户可以访问
+    if record.user_id is not None and (
+        current_user is None or record.user_id != current_user.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问此记录",
+        )
+
+    try:
+        image_file = await asyncio.to_thread(resolve_image_path, record.image_path)
+    except FileNotFoundError:
+        image_file = None
+    if image_file is None or not image_file.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图像文件不存在",
+        )
+    return record, image_file
+
 
 class EyeIdentificationDetail(BaseModel):
     chinese_name: str
@@ -57,6 +314,7 @@ class EyeIdentificationResponse(BaseModel):
     id: int
     results: list[EyeIdentificationResult]
     image_url: str
+    signed_image_url: Optional[str] = None
     created_at: datetime
 
 
@@ -73,15 +331,68 @@ class EyeIdentificationSuggestion(BaseModel):
     created_at: datetime
 
 
+# Grad-CAM 返回格式：jpeg 为叠加热力图后的图像；heatmap 为目标层分辨率的
+# uint8 热力图原始字节（行优先），尺寸等信息放在响应头中；heatmap_json 为
+# base64 编码的热力图与元数据。后两种由客户端自行着色与叠加，调整透明度无需再次请求
+GradcamFormat = Literal["jpeg", "heatmap", "heatmap_json"]
+
+# 原始热力图响应携带的元数据响应头
+HEATMAP_HEADERS = [
+    "X-Heatmap-Width",
+    "X-Heatmap-Height",
+    "X-Heatmap-Class-Index",
+    "X-Heatmap-Layer",
+    "X-Model-Version",
+]
+
+
+def heatmap_payload(heatmap, class_index: int, last_conv_layer_name: str) -> dict:
+    """uint8 热力图及其元数据，数据为 base64 编码的行优先字节"""
+    return {
+        "class_index": class_index,
+        "label": label_names[class_index],
+        "last_conv_layer_name": last_conv_layer_name,
+        "model_version": get_gradcam_model_version(),
+        "width": heatmap.shape[1],
+        "height": heatmap.shape[0],
+        "dtype": "uint8",
+        "data": base64.b64encode(heatmap.tobytes()).decode("ascii"),
+    }
+
+
+def heatmap_response(
+    heatmap, class_index: int, last_conv_layer_name: str, format: GradcamFormat
+) -> Response:
+    """按 heatmap / heatmap_json 格式返回未着色的热力图"""
+    if format == "heatmap_json":
+        return JSONResponse(
+            content=heatmap_payload(heatmap, class_index, last_conv_layer_name)
+        )
+    values = [
+        str(heatmap.shape[1]),
+        str(heatmap.shape[0]),
+        str(class_index),
+        last_conv_layer_name,
+        get_gradcam_model_version(),
+    ]
+    return Response(
+        content=heatmap.tobytes(),
+        media_type="application/octet-stream",
+        headers=dict(zip(HEATMAP_HEADERS, values)),
+    )
+
+
 @router.post(
     "/eye",
     summary="眼部疾病识别",
     response_model=EyeIdentificationResponse,
 )
 async def identify_eye_disease(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     threshold: float = Config.IDENTIFICATION_CONFIG["default_threshold"],
-    db: Session = Depends(get_db),
+    with_gradcam: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[Users] = Depends(get_current_user),
 ):
     """
@@ -89,6 +400,8 @@ async def identify_eye_disease(
 
     - **file**: 上传的眼部图像文件
     - **threshold**: 识别阈值（可选，默认0.1）
+    - **with_gradcam**: 是否同时准备Grad-CAM（可选，默认否）。开启后识别时捕获卷积层激活，
+      返回结果后在后台生成最高概率标签的热力图，之后的 `POST /identify/gradcam/{id}` 直接命中缓存
     """
     # 验证文件类型
     allowed_types = Config.get_allowed_types()
@@ -98,44 +411,63 @@ async def identify_eye_disease(
             detail=f"仅支持{', '.join([t.split('/')[-1].upper() for t in allowed_types])}格式的图像",
         )
 
+    # 分块读取并校验大小、格式与图像尺寸，同时计算内容哈希，不合格的上传不会被解码
+    upload = await read_image_upload(file)
+    image_bytes, image_hash = upload.data, upload.sha256
+    # 按内容寻址存储，相同图像只保存一份
+    image_key = content_key(image_hash, IMAGE_EXTENSIONS[upload.format])
+    storage = get_storage()
+
     try:
-        # 创建临时文件
-        with NamedTemporaryFile(delete=False) as temp_file:
-            # 将上传的文件内容复制到临时文件
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file_path = temp_file.name
-
-        # 使用异步函数进行识别，不会阻塞事件循环
-        results = await identify_eye_async(temp_file_path, threshold)
-        for result in results:
-            if "label" in result:
-                result["details"] = get_details_by_disease_name(result["label"])
-
-        # 创建存储目录（按年月日组织）
-        today = datetime.now()
-        save_dir = UPLOAD_DIR / str(today.year) / str(today.month) / str(today.day)
-        save_dir.mkdir(parents=True, exist_ok=True)
-
-        # 生成唯一文件名
-        original_filename = file.filename
-        extension = os.path.splitext(original_filename)[1]
-        unique_filename = (
-            f"{today.strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}{extension}"
-        )
-        save_path = save_dir / unique_filename
-
-        # 将临时文件移动到目标位置
-        shutil.move(temp_file_path, save_path)
+        model_version = get_model_version()
+
+        # 识别与原图写入存储并行执行，写入在线程中完成，不阻塞事件循环
+        user_key = fair_queue_key(current_user)
+        if with_gradcam:
+            predict = predict_fused_with_cache(db, image_bytes, image_hash, user_key)
+        else:
+            predict = predict_with_cache(
+                db, image_bytes, image_hash, model_version, user_key
+            )
+        prediction, _ = await asyncio.gather(
+            predict, asyncio.to_thread(storage.put, image_key, image_bytes)
+        )
+        probabilities, activations = prediction if with_gradcam else (prediction, None)
+
+        # 缓存的是完整概率向量，每次请求重新应用阈值；结果已包含疾病详情
+        results = postprocess_single(probabilities, threshold)
 
         # 保存识别记录到数据库
+        # 识别记录与图像引用计数在同一事务中提交
         eye_identification = EyeIdentification(
             user_id=current_user.id if current_user else None,
-            image_path=str(save_path),
+            image_path=image_key,
             results=json.dumps(results),
         )
         db.add(eye_identification)
-        db.commit()
-        db.refresh(eye_identification)
+        await db.run_sync(add_reference, image_key, len(image_bytes))
+        schedule_recompression(db, [image_key])
+        await db.commit()
+        notify_recompression()
+        await db.refresh(eye_identification)
+        # 写入存储后本地已有文件（远程存储写入了本地缓存），预先缓存图像文件信息
+        image_file = storage.local_path(image_key, fetch=False)
+        image_file_cache.put(
+            eye_identification.id,
+            build_image_file_info(str(image_file), image_hash),
+        )
+        # 在后台生成历史记录页所用的缩略图
+        submit_thumbnails(image_file)
+
+        if with_gradcam:
+            # 响应返回后再生成热力图，与Grad-CAM接口默认解释的标签一致
+            background_tasks.add_task(
+                precompute_heatmap,
+                eye_identification.id,
+                label_names.index(results[0]["label"]),
+                activations,
+                str(image_file),
+            )
 
         # 构建图片访问URL
         image_url = f"/api/v1/identify/images/{eye_identification.id}"
@@ -144,52 +476,276 @@ async def identify_eye_disease(
             "id": eye_identification.id,
             "results": results,
             "image_url": image_url,
+            # 短期有效的签名URL，由反向代理直接发送文件
+            "signed_image_url": direct_image_url(image_key),
             "created_at": eye_identification.created_at.isoformat(),
         }
 
-    except Exception as e:
-        # 清理临时文件
-        if "temp_file_path" in locals() and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+    # 失败时已写入存储但未被引用的图像不在这里删除（相同内容可能正被其他请求引用），
+    # 由 python -m storage.migrate --gc 清理
+    except QueueFullError as e:
+        # 推理队列已满或预计等待过长，快速拒绝而不是无限排队
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
+    except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"识别过程中发生错误: {str(e)}",
         )
 
 
+@router.post(
+    "/eye/batch",
+    summary="批量眼部疾病识别",
+    response_description="NDJSON流，每张图像识别完成后立即输出一行",
+)
+async def identify_eye_disease_batch(
+    files: list[UploadFile] = File(...),
+    threshold: float = Config.IDENTIFICATION_CONFIG["default_threshold"],
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    批量眼部疾病识别接口，支持多个图像文件或包含图像的zip文件
+
+    - **files**: 上传的眼部图像文件，或包含图像的zip文件
+    - **threshold**: 识别阈值（可选，默认0.1）
+
+    每张图像识别完成后立即输出一行JSON（按完成顺序，`index` 为上传顺序）：
+    成功为 `{"index", "filename", "results"}`，失败为 `{"index", "filename", "error"}`。
+    全部完成后识别记录一次性批量写入数据库，最后一行为
+    `{"done": true, "items": [{"index", "id", "image_url", "signed_image_url"}, ...]}`。
+    """
+    allowed_types = Config.get_allowed_types()
+    zip_types = Config.UPLOAD_CONFIG["zip_types"]
+    max_files = Config.get_max_batch_files()
+    max_file_size = Config.get_max_file_size()
+
+    # 在开始流式响应前读取并校验全部上传内容，校验失败直接返回400
+    images = []
+    for file in files:
+        if file.content_type in zip_types:
+            content = await read_upload(file, Config.UPLOAD_CONFIG["max_zip_size"])
+            try:
+                entries = await asyncio.to_thread(
+                    expand_zip_images,
+                    content,
+                    max_files - len(images),
+                    max_file_size,
+                )
+            except (zipfile.BadZipFile, ValueError) as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"zip文件无效: {file.filename}: {str(e)}",
+                )
+            # zip内的图像与直接上传的图像一样，在解码之前校验魔数与尺寸
+            for name, data in entries:
+                validate_image_bytes(f"{file.filename}/{name}", data, allowed_types)
+            images.extend(entries)
+        elif file.content_type in allowed_types:
+            upload = await read_image_upload(file, max_file_size, allowed_types)
+            images.append((file.filename, upload.data))
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"仅支持{', '.join([t.split('/')[-1].upper() for t in allowed_types])}格式的图像或zip文件",
+            )
+        if len(images) > max_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"图像数量超过上限{max_files}张",
+            )
+
+    if not images:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="没有可识别的图像",
+        )
+
+    # 流式响应在依赖项清理之后才结束，因此使用独立的数据库会话
+    user_id = current_user.id if current_user else None
+    user_key = fair_queue_key(current_user)
+    model_version = get_model_version()
+
+    storage = get_storage()
+
+    async def identify_one(index: int, filename: str, image_bytes: bytes):
+        """识别单张图像，返回 (序号, 存储键, 识别结果, 错误信息)"""
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        image_key = new_image_key(image_bytes, image_hash, filename)
+        # 各图像并发查询结果缓存，异步会话不能并发使用，每张图像使用独立的会话
+        async with AsyncSessionLocal() as db:
+            probabilities, saved = await asyncio.gather(
+                predict_with_cache(
+                    db, image_bytes, image_hash, model_version, user_key
+                ),
+                asyncio.to_thread(storage.put, image_key, image_bytes),
+                return_exceptions=True,
+            )
+        for outcome in (probabilities, saved):
+            if isinstance(outcome, BaseException):
+                return index, None, None, str(outcome)
+        return index, image_key, postprocess_single(probabilities, threshold), None
+
+    async def stream_results():
+        db = AsyncSessionLocal()
+        # 所有图像同时提交，由动态批处理调度器合并为批次推理
+        tasks = [
+            asyncio.create_task(identify_one(index, filename, image_bytes))
+            for index, (filename, image_bytes) in enumerate(images)
+        ]
+        records = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, image_key, results, error = await next_done
+                line = {"index": index, "filename": images[index][0]}
+                if error is not None:
+                    line["error"] = error
+                else:
+                    line["results"] = results
+                    records[index] = EyeIdentification(
+                        user_id=user_id,
+                        image_path=image_key,
+                        results=json.dumps(results),
+                    )
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+
+            # 全部识别完成后一次性批量写入识别记录与图像引用计数
+            items = []
+            if records:
+                db.add_all(records.values())
+                for index, record in records.items():
+                    await db.run_sync(
+                        add_reference, record.image_path, len(images[index][1])
+                    )
+                schedule_recompression(
+                    db, {record.image_path for record in records.values()}
+                )
+                await db.flush()
+                items = [
+                    {
+                        "index": index,
+                        "id": record.id,
+                        "image_url": f"/api/v1/identify/images/{record.id}",
+                        "signed_image_url": direct_image_url(record.image_path),
+                    }
+                    for index, record in sorted(records.items())
+                ]
+                await db.commit()
+                notify_recompression()
+                for record in records.values():
+                    submit_thumbnails(
+                        storage.local_path(record.image_path, fetch=False)
+                    )
+            yield json.dumps({"done": True, "items": items}) + "\n"
+
+        except BaseException:
+            # 客户端断开或写库失败时不写入识别记录；
+            # 已写入存储但未被引用的图像由 python -m storage.migrate --gc 清理
+            await db.rollback()
+            raise
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            await db.close()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @router.get("/images/{identification_id}", summary="获取眼部图像")
 async def get_eye_image(
     identification_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    size: Optional[int] = None,
+    format: Literal["webp", "jpeg"] = "webp",
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     获取特定识别记录的眼部图像。只有图像所有者可以访问。
 
+    存储的图像不会改变：响应带有内容哈希作为强ETag并允许长期缓存，
+    支持 If-None-Match / If-Modified-Since 条件请求（返回304）与 Range 请求。
+
     - **identification_id**: 识别记录ID
+    - **size**: 缩略图长边像素数（可选，见配置 THUMBNAIL_CONFIG，默认返回原图）
+    - **format**: 缩略图格式，webp（默认）或jpeg，只在指定size时生效
     """
-    # 查询特定的识别记录
-    record = (
-        db.query(EyeIdentification)
-        .filter(EyeIdentification.id == identification_id)
-        .first()
-    )
-
-    if not record:
+    if size is not None and size not in Config.THUMBNAIL_CONFIG["sizes"]:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="识别记录不存在",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size参数必须为{Config.THUMBNAIL_CONFIG['sizes']}之一",
         )
 
-    # 获取图像路径并返回文件
-    image_path = record.image_path
-    if not os.path.exists(image_path):
+    # 每次按主键查询记录的图像：记录可能已在其他进程中删除，
+    # 图像也可能已被其他进程中的入库重压缩替换，这些进程无法清除本进程的缓存
+    image_path = await db.scalar(
+        select(EyeIdentification.image_path).where(
+            EyeIdentification.id == identification_id
+        )
+    )
+    if image_path is None:
+        image_file_cache.evict(identification_id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="图像文件不存在",
+            detail="识别记录不存在",
         )
 
-    return FileResponse(image_path)
+    # 命中进程内缓存时无需解析存储路径与计算哈希
+    info = image_file_cache.get(identification_id)
+    if info is not None and not is_cached_image_current(info, image_path):
+        image_file_cache.evict(identification_id)
+        info = None
+    if info is None:
+        # 在线程中解析图像的本地路径并读取文件状态
+        try:
+            info = await asyncio.to_thread(load_image_file_info, image_path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="图像文件不存在",
+            )
+        image_file_cache.put(identification_id, info)
+
+    if size is not None:
+        # 缩略图由原图派生，ETag 在原图内容哈希后附加尺寸与格式
+        variant = f"{size}.{format}"
+        thumbnail_info = image_file_cache.get(identification_id, variant)
+        if thumbnail_info is None or not os.path.exists(thumbnail_info.path):
+            # 后台尚未生成时按需生成，之后直接读取已存储的缩略图
+            try:
+                thumbnail = await asyncio.to_thread(
+                    get_or_create_thumbnail, info.path, size, format
+                )
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"缩略图生成失败: {str(e)}",
+                )
+            original_hash = info.etag.strip('"')
+            thumbnail_info = build_image_file_info(
+                str(thumbnail), f"{original_hash}-{variant}"
+            )
+            image_file_cache.put(identification_id, thumbnail_info, variant)
+        info = thumbnail_info
+
+    headers = {
+        "ETag": info.etag,
+        "Cache-Control": Config.CACHE_CONFIG["image_cache_control"],
+    }
+    if is_not_modified(
+        info,
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+    ):
+        headers["Last-Modified"] = formatdate(info.stat_result.st_mtime, usegmt=True)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # FileResponse 处理 Range 请求并设置 Last-Modified / Content-Length
+    return FileResponse(info.path, headers=headers, stat_result=info.stat_result)
 
 
 @router.get("/history", summary="获取眼部识别历史记录")
@@ -198,7 +754,7 @@ async def get_identification_history(
     limit: int = 10,
     sort: str = "created_at",
     order: Order = Order.DESC,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Users = Depends(get_current_user),
 ):
     """
@@ -208,7 +764,7 @@ async def get_identification_history(
     - **limit**: 返回的最大记录数（分页用）
     """
     # 查询当前用户的识别历史
-    query = db.query(EyeIdentification).filter(
+    query = select(EyeIdentification).where(
         EyeIdentification.user_id == current_user.id
     )
 
@@ -224,13 +780,13 @@ async def get_identification_history(
         query = query.order_by(EyeIdentification.created_at.desc())
 
     # 分页
-    history = query.offset(skip).limit(limit).all()
+    history = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     # 统计总记录数
-    total_count = (
-        db.query(EyeIdentification)
-        .filter(EyeIdentification.user_id == current_user.id)
-        .count()
+    total_count = await db.scalar(
+        select(func.count())
+        .select_from(EyeIdentification)
+        .where(EyeIdentification.user_id == current_user.id)
     )
 
     # 转换为字典列表并添加图片URL
@@ -242,6 +798,9 @@ async def get_identification_history(
                 "results": json.loads(record.results),
                 "created_at": record.created_at.isoformat(),
                 "image_url": f"/api/v1/identify/images/{record.id}",
+                "signed_image_url": direct_image_url(record.image_path),
+                # 列表页使用的缩略图
+                "thumbnail_url": f"/api/v1/identify/images/{record.id}?size=256",
             }
         )
 
@@ -260,7 +819,7 @@ async def get_identification_history(
 )
 async def get_identification_detail(
     identification_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Users = Depends(get_current_user),
 ):
     """
@@ -269,13 +828,11 @@ async def get_identification_detail(
     - **identification_id**: 识别记录ID
     """
     # 查询特定的识别记录
-    record = (
-        db.query(EyeIdentification)
-        .filter(
+    record = await db.scalar(
+        select(EyeIdentification).where(
             EyeIdentification.id == identification_id,
             EyeIdentification.user_id == current_user.id,
         )
-        .first()
     )
 
     if not record:
@@ -287,6 +844,7 @@ async def get_identification_detail(
     record_dict = record.to_dict()
     # 添加图片访问URL
     record_dict["image_url"] = f"/api/v1/identify/images/{record.id}"
+    record_dict["signed_image_url"] = direct_image_url(record.image_path)
     return record_dict
 
 
@@ -299,7 +857,7 @@ async def get_disease_suggestion(
     disease: str,
     age: int,
     gender: Gender,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Users = Depends(get_current_user),
 ):
     """
@@ -310,20 +868,20 @@ async def get_disease_suggestion(
     - **gender**: 用户性别
     """
     # 验证是否已经存在相同记录
-    record = (
-        db.query(IdentifySuggestions)
-        .filter(
+    record = await db.scalar(
+        select(IdentifySuggestions).where(
             IdentifySuggestions.disease == disease,
             IdentifySuggestions.age == age,
             IdentifySuggestions.gender == gender,
         )
-        .first()
     )
 
     # 如果记录已存在，返回现有记录
     if record:
         return record.to_dict()
 
+    # 结束只读事务，调用大模型期间不占用数据库连接
+    await db.commit()
     # 创建新的识别建议记录
     suggestion = await get_disease_suggested_from_model(disease, age, gender)
 
@@ -336,8 +894,8 @@ async def get_disease_suggestion(
     )
 
     db.add(db_suggestion)
-    db.commit()
-    db.refresh(db_suggestion)
+    await db.commit()
+    await db.refresh(db_suggestion)
     return db_suggestion.to_dict()
 
 
@@ -372,25 +930,29 @@ def delete_identification_record(
             detail="识别记录不存在或无权访问",
         )
 
-    # 删除记录
+    # 删除记录及其缓存的热力图，并释放图像引用
+    heatmap_cache.evict(db, record.id)
+    image_file_cache.evict(record.id)
+    delete_now = release_image(db, record.image_path)
     db.delete(record)
     db.commit()
 
-    # 删除图像文件
-    if os.path.exists(record.image_path):
-        os.remove(record.image_path)
+    # 迁移前的图像文件直接删除（连同缩略图），内容寻址的图像由清理任务删除
+    if delete_now:
+        delete_image(record.image_path)
 
 
 @router.post(
     "/gradcam",
     summary="生成眼部图像的Grad-CAM热力图",
-    response_description="返回叠加了热力图的JPEG图像",
+    response_description="返回叠加了热力图的JPEG图像，或未着色的热力图",
 )
 async def create_gradcam(
     file: UploadFile = File(...),
     alpha: float = 0.4,
     last_conv_layer_name: str = "mixed10",
-    db: Session = Depends(get_db),
+    format: GradcamFormat = "jpeg",
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[Users] = Depends(get_current_user),
 ):
     """
@@ -398,7 +960,8 @@ async def create_gradcam(
 
     - **file**: 上传的眼部图像文件
     - **alpha**: 热力图透明度，值范围0-1，默认0.4
-    - **last_conv_layer_name**: 目标卷积层名称，默认为'mixed10'
+    - **last_conv_layer_name**: 目标卷积层名称，可选'mixed7'~'mixed10'，默认为'mixed10'
+    - **format**: 返回格式，jpeg（默认）、heatmap（uint8原始字节）或heatmap_json
     """
     # 验证文件类型
     allowed_types = Config.get_allowed_types()
@@ -414,36 +977,43 @@ async def create_gradcam(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="alpha参数必须在0到1之间",
         )
+    check_gradcam_layer(last_conv_layer_name)
+
+    # 分块读取并校验大小、格式与图像尺寸，直接使用上传内容的字节在内存中解码
+    image_bytes = (await read_image_upload(file)).data
 
     try:
-        # 创建临时文件
-        with NamedTemporaryFile(delete=False) as temp_file:
-            # 将上传的文件内容复制到临时文件
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file_path = temp_file.name
-
-        # 使用generate_gradcam函数生成热力图
-        gradcam_img_bgr = generate_gradcam(
-            image_path=temp_file_path,
-            model_path=None,  # 使用默认模型
+        if format != "jpeg":
+            heatmap, class_index = await compute_heatmap_async(
+                image_bytes, last_conv_layer_name
+            )
+            return heatmap_response(heatmap, class_index, last_conv_layer_name, format)
+
+        # 在Grad-CAM专用线程池中生成热力图并编码为JPEG，不阻塞事件循环
+        image_jpeg = await generate_gradcam_jpeg_async(
+            image_bytes,
             last_conv_layer_name=last_conv_layer_name,
             alpha=alpha,
         )
 
-        # 将OpenCV格式的图像（BGR）编码为JPEG格式
-        _, img_encoded = cv2.imencode(".jpg", gradcam_img_bgr)
+        # 返回图像数据
+        return Response(content=image_jpeg, media_type="image/jpeg")
 
-        # 删除临时文件
-        os.unlink(temp_file_path)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
-        # 返回图像数据
-        return Response(content=img_encoded.tobytes(), media_type="image/jpeg")
+    except ValueError as e:
+        # 图像无法解码或目标卷积层不存在
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     except Exception as e:
-        # 清理临时文件
-        if "temp_file_path" in locals() and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
-
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"生成Grad-CAM过程中发生错误: {str(e)}",
@@ -453,21 +1023,27 @@ async def create_gradcam(
 @router.post(
     "/gradcam/{identification_id}",
     summary="为已存在的识别记录生成Grad-CAM热力图",
-    response_description="返回叠加了热力图的JPEG图像",
+    response_description="返回叠加了热力图的JPEG图像，或未着色的热力图",
 )
 async def create_gradcam_for_record(
     identification_id: int,
     alpha: float = 0.4,
     last_conv_layer_name: str = "mixed10",
-    db: Session = Depends(get_db),
+    class_index: Optional[int] = None,
+    format: GradcamFormat = "jpeg",
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[Users] = Depends(get_current_user),
 ):
     """
     为已存在的识别记录生成Grad-CAM热力图
 
+    热力图按 (识别记录, 目标层, 类别, 模型版本) 缓存，调整alpha时只重新叠加图像。
+
     - **identification_id**: 识别记录ID
     - **alpha**: 热力图透明度，值范围0-1，默认0.4
-    - **last_conv_layer_name**: 目标卷积层名称，默认为'mixed10'
+    - **last_conv_layer_name**: 目标卷积层名称，可选'mixed7'~'mixed10'，默认为'mixed10'
+    - **class_index**: 解释的类别索引（可选，默认为识别结果中概率最高的标签）
+    - **format**: 返回格式，jpeg（默认）、heatmap（uint8原始字节）或heatmap_json
     """
     # 参数验证
     if not (0 <= alpha <= 1):
@@ -475,54 +1051,194 @@ async def create_gradcam_for_record(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="alpha参数必须在0到1之间",
         )
+    check_gradcam_layer(last_conv_layer_name)
+    if class_index is not None and not (0 <= class_index < len(label_names)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"class_index参数必须在0到{len(label_names) - 1}之间",
+        )
 
-    # 查询特定的识别记录
-    record = (
-        db.query(EyeIdentification)
-        .filter(EyeIdentification.id == identification_id)
-        .first()
-    )
+    record, image_path = await get_gradcam_record(db, identification_id, current_user)
 
-    if not record:
+    try:
+        # 默认解释识别结果中概率最高的标签（结果按概率降序排列）
+        if class_index is None:
+            class_index = label_names.index(json.loads(record.results)[0]["label"])
+
+        # 缓存未命中时在Grad-CAM专用线程池中计算热力图
+        (heatmap,) = await get_or_compute_heatmaps(
+            db, record.id, image_path, last_conv_layer_name, [class_index]
+        )
+        if format != "jpeg":
+            return heatmap_response(heatmap, class_index, last_conv_layer_name, format)
+
+        # 按alpha叠加并编码为JPEG，不涉及模型计算
+        image_jpeg = await blend_heatmap_jpeg_async(image_path, heatmap, alpha)
+
+        # 返回图像数据
+        return Response(content=image_jpeg, media_type="image/jpeg")
+
+    except QueueFullError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="识别记录不存在",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
         )
 
-    # 检查权限：如果记录属于某个用户，只有该用户可以访问
-    if record.user_id is not None and (
-        current_user is None or record.user_id != current_user.id
-    ):
+    except ValueError as e:
+        # 图像无法解码或目标卷积层不存在
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="无权访问此记录",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
         )
 
-    try:
-        # 获取图像路径
-        image_path = record.image_path
-        if not os.path.exists(image_path):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="图像文件不存在",
-            )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成Grad-CAM过程中发生错误: {str(e)}",
+        )
 
-        # 使用generate_gradcam函数生成热力图
-        gradcam_img_bgr = generate_gradcam(
-            image_path=image_path,
-            model_path=None,  # 使用默认模型
-            last_conv_layer_name=last_conv_layer_name,
-            alpha=alpha,
+
+@router.post(
+    "/gradcam/{identification_id}/labels",
+    summary="为识别记录的多个标签生成Grad-CAM热力图",
+    response_description="返回包含各标签叠加图的zip文件，或包含base64图像/热力图的JSON",
+)
+async def create_multi_label_gradcam_for_record(
+    identification_id: int,
+    class_indices: Optional[list[int]] = Query(None),
+    alpha: float = 0.4,
+    last_conv_layer_name: str = "mixed10",
+    format: Literal["zip", "json", "heatmap_json"] = "zip",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    一次前向传播为识别记录的多个标签生成Grad-CAM热力图
+
+    - **identification_id**: 识别记录ID
+    - **class_indices**: 解释的类别索引，可重复传入（可选，默认为识别结果中的全部标签）
+    - **alpha**: 热力图透明度，值范围0-1，默认0.4
+    - **last_conv_layer_name**: 目标卷积层名称，可选'mixed7'~'mixed10'，默认为'mixed10'
+    - **format**: 返回格式，zip（默认）、json（base64编码的叠加图）或heatmap_json（未着色的热力图）
+    """
+    # 参数验证
+    if not (0 <= alpha <= 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="alpha参数必须在0到1之间",
         )
+    check_gradcam_layer(last_conv_layer_name)
 
-        # 将OpenCV格式的图像（BGR）编码为JPEG格式
-        _, img_encoded = cv2.imencode(".jpg", gradcam_img_bgr)
+    record, image_path = await get_gradcam_record(db, identification_id, current_user)
+    results = json.loads(record.results)
 
-        # 返回图像数据
-        return Response(content=img_encoded.tobytes(), media_type="image/jpeg")
+    if not class_indices:
+        class_indices = [label_names.index(result["label"]) for result in results]
+    # 去重并保持顺序
+    class_indices = list(dict.fromkeys(class_indices))
+    if any(not (0 <= index < len(label_names)) for index in class_indices):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"class_indices参数必须在0到{len(label_names) - 1}之间",
+        )
+
+    try:
+        # 未缓存的类别在一次前向传播中一起计算
+        heatmaps = await get_or_compute_heatmaps(
+            db, record.id, image_path, last_conv_layer_name, class_indices
+        )
+        if format == "heatmap_json":
+            return {
+                "identification_id": record.id,
+                "last_conv_layer_name": last_conv_layer_name,
+                "items": [
+                    heatmap_payload(heatmap, index, last_conv_layer_name)
+                    for index, heatmap in zip(class_indices, heatmaps)
+                ],
+            }
+        images_jpeg = await blend_heatmaps_jpeg_async(image_path, heatmaps, alpha)
+
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    except ValueError as e:
+        # 图像无法解码或目标卷积层不存在
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"生成Grad-CAM过程中发生错误: {str(e)}",
         )
+
+    if format == "json":
+        probabilities = {result["label"]: result["probability"] for result in results}
+        return {
+            "identification_id": record.id,
+            "last_conv_layer_name": last_conv_layer_name,
+            "items": [
+                {
+                    "class_index": index,
+                    "label": label_names[index],
+                    "probability": probabilities.get(label_names[index]),
+                    "image": base64.b64encode(image_jpeg).decode("ascii"),
+                }
+                for index, image_jpeg in zip(class_indices, images_jpeg)
+            ],
+        }
+
+    return Response(
+        content=pack_gradcam_zip(class_indices, images_jpeg),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="gradcam_{record.id}.zip"'
+        },
+    )
+
+
+@router.get("/models", summary="获取已加载模型信息")
+async def get_loaded_models():
+    """
+    获取当前进程中已加载模型的版本、加载耗时和内存占用
+    """
+    return model_registry.describe()
+
+
+@router.get("/cache/stats", summary="获取识别结果缓存统计")
+async def get_result_cache_stats():
+    """
+    获取识别结果缓存的命中/未命中计数与容量预算
+    """
+    return result_cache.stats()
+
+
+@router.get("/gradcam/cache/stats", summary="获取Grad-CAM热力图缓存统计")
+async def get_heatmap_cache_stats():
+    """
+    获取热力图缓存的命中/未命中计数与内存占用
+    """
+    return heatmap_cache.stats()
+
+
+@router.get("/queue/stats", summary="获取识别队列统计")
+async def get_identification_queue_stats():
+    """
+    获取准入控制的并发数、排队数、预计等待时间与拒绝计数
+    """
+    return get_admission_stats()
+
+
+@router.get("/storage/stats", summary="获取图像存储统计")
+async def get_storage_stats(db: AsyncSession = Depends(get_async_db)):
+    """
+    获取图像存储的对象数与字节数，以及去重和入库重压缩节省的存储空间
+    """
+    return await db.run_sync(storage_report)
@@ -0,0 +1,239 @@
+import json
+import os
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.auth_handler import get_current_user
+from Config import Config
+from database import get_async_db
+from eye_identify import label_names
+from jobs import enqueue_job, job_workers
+from models.Job import Job, JobStatus
+from models.Users import Users
+from routers.identify_router import check_gradcam_layer, get_gradcam_record
+from utils import signed_media_url
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["后台任务"],
+)
+
+
+def job_response(job: Job) -> dict:
+    """任务信息，附带状态查询与结果下载地址（含签名URL）"""
+    data = job.to_dict()
+    data["status_url"] = f"/api/v1/jobs/{job.id}"
+    data["result_url"] = None
+    data["signed_result_url"] = None
+    if job.status == JobStatus.SUCCEEDED:
+        data["result_url"] = f"/api/v1/jobs/{job.id}/result"
+        # 结果文件位于上传目录中，可由反向代理直接发送
+        data["signed_result_url"] = signed_media_url(json.loads(job.result)["path"])
+    return data
+
+
+async def create_job(
+    db: AsyncSession, job_type: str, params: dict, current_user: Optional[Users]
+) -> JSONResponse:
+    """创建任务并唤醒工作者，返回202"""
+    job = await db.run_sync(
+        enqueue_job, job_type, params, current_user.id if current_user else None
+    )
+    job_workers.notify_enqueued()
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=job_response(job),
+        headers={"Location": f"/api/v1/jobs/{job.id}"},
+    )
+
+
+async def get_job_record(
+    db: AsyncSession, job_id: int, current_user: Optional[Users], refresh: bool = False
+) -> Job:
+    """查询任务并检查访问权限，refresh 为 True 时重新读取数据库中的任务状态"""
+    job = await db.get(Job, job_id, populate_existing=refresh)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务不存在",
+        )
+
+    # 检查权限：如果任务属于某个用户，只有该用户可以访问
+    if job.user_id is not None and (
+        current_user is None or job.user_id != current_user.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问此任务",
+        )
+    return job
+
+
+@router.post(
+    "/gradcam/{identification_id}",
+    summary="创建Grad-CAM任务",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_gradcam_job(
+    identification_id: int,
+    alpha: float = 0.4,
+    last_conv_layer_name: str = "mixed10",
+    class_index: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    为识别记录创建Grad-CAM任务，立即返回任务ID，结果为叠加了热力图的JPEG图像
+
+    - **identification_id**: 识别记录ID
+    - **alpha**: 热力图透明度，值范围0-1，默认0.4
+    - **last_conv_layer_name**: 目标卷积层名称，可选'mixed7'~'mixed10'，默认为'mixed10'
+    - **class_index**: 解释的类别索引（可选，默认为识别结果中概率最高的标签）
+    """
+    # 参数验证
+    if not (0 <= alpha <= 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="alpha参数必须在0到1之间",
+        )
+    check_gradcam_layer(last_conv_layer_name)
+    if class_index is not None and not (0 <= class_index < len(label_names)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"class_index参数必须在0到{len(label_names) - 1}之间",
+        )
+
+    record, _ = await get_gradcam_record(db, identification_id, current_user)
+    return await create_job(
+        db,
+        "gradcam",
+        {
+            "identification_id": record.id,
+            "alpha": alpha,
+            "last_conv_layer_name": last_conv_layer_name,
+            "class_index": class_index,
+        },
+        current_user,
+    )
+
+
+@router.post(
+    "/gradcam/{identification_id}/labels",
+    summary="创建多标签Grad-CAM任务",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_multi_label_gradcam_job(
+    identification_id: int,
+    class_indices: Optional[list[int]] = Query(None),
+    alpha: float = 0.4,
+    last_conv_layer_name: str = "mixed10",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    为识别记录的多个标签创建Grad-CAM任务，结果为包含各标签叠加图的zip文件
+
+    - **identification_id**: 识别记录ID
+    - **class_indices**: 解释的类别索引，可重复传入（可选，默认为识别结果中的全部标签）
+    - **alpha**: 热力图透明度，值范围0-1，默认0.4
+    - **last_conv_layer_name**: 目标卷积层名称，可选'mixed7'~'mixed10'，默认为'mixed10'
+    """
+    # 参数验证
+    if not (0 <= alpha <= 1):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="alpha参数必须在0到1之间",
+        )
+    check_gradcam_layer(last_conv_layer_name)
+
+    record, _ = await get_gradcam_record(db, identification_id, current_user)
+    if not class_indices:
+        class_indices = [
+            label_names.index(result["label"]) for result in json.loads(record.results)
+        ]
+    # 去重并保持顺序
+    class_indices = list(dict.fromkeys(class_indices))
+    if any(not (0 <= index < len(label_names)) for index in class_indices):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"class_indices参数必须在0到{len(label_names) - 1}之间",
+        )
+
+    return await create_job(
+        db,
+        "gradcam_labels",
+        {
+            "identification_id": record.id,
+            "alpha": alpha,
+            "last_conv_layer_name": last_conv_layer_name,
+            "class_indices": class_indices,
+        },
+        current_user,
+    )
+
+
+@router.get("/{job_id}", summary="查询任务状态")
+async def get_job(
+    job_id: int,
+    wait: float = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    查询任务状态、排队等待与执行耗时，任务成功后返回结果下载地址
+
+    - **job_id**: 任务ID
+    - **wait**: 长轮询等待秒数（可选），任务未结束时最多等待该时间再返回，
+      上限见配置 max_long_poll_s
+    """
+    job = await get_job_record(db, job_id, current_user)
+    deadline = time.monotonic() + min(wait, Config.JOBS_CONFIG["max_long_poll_s"])
+    while not job.finished:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # 结束只读事务，等待期间不占用数据库连接
+        await db.commit()
+        # 本进程内的任务结束时立即唤醒，其他进程执行的任务按轮询间隔重新查询
+        await job_workers.wait_for_update(
+            min(remaining, Config.JOBS_CONFIG["poll_interval_s"] * 4)
+        )
+        job = await get_job_record(db, job_id, current_user, refresh=True)
+    return job_response(job)
+
+
+@router.get("/{job_id}/result", summary="下载任务结果")
+async def get_job_result(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[Users] = Depends(get_current_user),
+):
+    """
+    下载已成功任务的结果文件
+
+    - **job_id**: 任务ID
+    """
+    job = await get_job_record(db, job_id, current_user)
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"任务尚未成功完成，当前状态: {job.status.value}",
+        )
+
+    result = json.loads(job.result)
+    if not os.path.exists(result["path"]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="任务结果文件不存在",
+        )
+
+    extension = result["path"].rsplit(".", 1)[-1]
+    return FileResponse(
+        result["path"],
+        media_type=result["media_type"],
+        filename=f"job_{job.id}.{extension}",
+    )
@@ -0,0 +1,72 @@
+import mimetypes
+import time
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import FileResponse, Response
+
+from Config import Config
+from utils import verify_media_signature
+
+router = APIRouter(
+    prefix="/media",
+    tags=["媒体文件"],
+)
+
+# 上传目录的绝对路径
+UPLOAD_ROOT = Config.get_upload_dir().resolve()
+
+
+@router.get("/{file_path:path}", summary="通过签名URL获取文件")
+async def get_media_file(
+    file_path: str,
+    expires: int = Query(...),
+    sig: str = Query(...),
+):
+    """
+    获取上传目录中的文件（识别图像、Grad-CAM任务结果等）
+
+    只校验URL签名与过期时间，不查询数据库；根据配置 MEDIA_DELIVERY：
+
+      - **python**：由应用直接发送文件（本地运行）
+      - **x-accel-redirect**：返回 X-Accel-Redirect 响应头，由 nginx 从 internal location 发送文件
+      - **x-sendfile**：返回 X-Sendfile 响应头，由 Apache / lighttpd 等发送文件
+
+    签名URL由识别、历史记录与任务接口返回（signed_image_url / signed_result_url）。
+    """
+    if not verify_media_signature(file_path, expires, sig):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="链接无效或已过期",
+        )
+
+    # 签名已覆盖路径，这里再次确认文件位于上传目录中
+    full_path = (UPLOAD_ROOT / file_path).resolve()
+    if not full_path.is_relative_to(UPLOAD_ROOT):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在",
+        )
+
+    # 文件内容不会改变，浏览器可缓存到链接过期为止
+    headers = {
+        "Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}"
+    }
+    media_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+
+    delivery = Config.MEDIA_CONFIG["delivery"]
+    if delivery == "x-accel-redirect":
+        headers["X-Accel-Redirect"] = Config.MEDIA_CONFIG["accel_prefix"] + quote(
+            file_path
+        )
+        return Response(media_type=media_type, headers=headers)
+    if delivery == "x-sendfile":
+        headers["X-Sendfile"] = str(full_path)
+        return Response(media_type=media_type, headers=headers)
+
+    if not full_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在",
+        )
+    return FileResponse(full_path, media_type=media_type, headers=headers)
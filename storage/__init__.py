@@ -0,0 +1,94 @@
+import threading
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from Config import Config
+from eye_identify import remove_thumbnails
+from utils import signed_media_url
+
+from .base import (
+    StorageBackend,
+    content_key,
+    is_content_key,
+    key_sha256,
+)
+from .local import LocalStorage
+from .recompress import recompress_object, storage_report
+from .references import add_reference, is_referenced, release_reference
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    """按配置创建存储后端"""
+    config = Config.STORAGE_CONFIG
+    backend = backend or config["backend"]
+    if backend == "local":
+        return LocalStorage(config["local_root"])
+    if backend == "s3":
+        from .s3 import S3Storage
+
+        return S3Storage(
+            bucket=config["s3_bucket"],
+            cache_dir=config["s3_cache_dir"],
+            prefix=config["s3_prefix"],
+            endpoint_url=config["s3_endpoint_url"],
+            region=config["s3_region"],
+            url_ttl_s=Config.MEDIA_CONFIG["url_ttl_s"],
+        )
+    raise ValueError(f"不支持的存储后端: {backend}")
+
+
+def get_storage() -> StorageBackend:
+    """获取全局存储后端，首次访问时创建"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def resolve_image_path(image_path: str) -> Path:
+    """
+    识别记录 image_path 对应的本地文件路径（阻塞操作，远程存储会下载）
+
+    迁移前的记录保存的是文件路径，原样返回
+    """
+    if is_content_key(image_path):
+        return get_storage().local_path(image_path)
+    return Path(image_path)
+
+
+def direct_image_url(image_path: str) -> Optional[str]:
+    """识别记录图像的短期直接访问URL，不支持时返回None"""
+    if is_content_key(image_path):
+        return get_storage().url(image_path)
+    return signed_media_url(image_path)
+
+
+def release_image(db: Session, image_path: str) -> bool:
+    """
+    识别记录不再引用图像（不提交事务），返回是否应立即删除存储中的图像
+
+    内容寻址的图像不立即删除：引用归零后相同内容可能正被并发的上传重新引用，
+    由 python -m storage.migrate --gc 在宽限期后清理；迁移前的文件路径没有引用计数，总是删除
+    """
+    if is_content_key(image_path):
+        release_reference(db, image_path)
+        return False
+    return True
+
+
+def delete_image(image_path: str) -> None:
+    """删除存储中的图像及其缩略图（阻塞操作）"""
+    if is_content_key(image_path):
+        storage = get_storage()
+        remove_thumbnails(storage.local_path(image_path, fetch=False))
+        storage.delete(image_path)
+    else:
+        Path(image_path).unlink(missing_ok=True)
+        remove_thumbnails(image_path)
@@ -0,0 +1,76 @@
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+# 内容寻址存储键的前缀，用于与迁移前的文件路径区分
+CONTENT_KEY_PREFIX = "sha256/"
+
+
+def content_key(sha256: str, extension: str = "") -> str:
+    """
+    由内容哈希生成存储键：sha256/ab/cd/abcd...{扩展名}
+
+    按哈希前两级分片，避免单个目录中的文件过多
+    """
+    return f"{CONTENT_KEY_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+
+def is_content_key(value: str) -> bool:
+    """是否为内容寻址的存储键（而不是迁移前的文件路径）"""
+    return value.startswith(CONTENT_KEY_PREFIX)
+
+
+def key_sha256(key: str) -> str:
+    """从存储键中取出内容哈希"""
+    return Path(key).stem
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """先写临时文件再重命名，并发读取不会读到不完整的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+class StorageBackend(ABC):
+    """
+    图像存储接口
+
+    所有方法都是阻塞的，在事件循环中使用时应放到线程中执行。
+    """
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """写入对象，已存在时覆盖或刷新修改时间（内容寻址下内容相同）"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """读取对象，不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """对象是否存在"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除对象，不存在时忽略"""
+
+    @abstractmethod
+    def local_path(self, key: str, fetch: bool = True) -> Path:
+        """
+        对象在本地文件系统中的路径，供解码、Grad-CAM、缩略图与文件响应使用
+
+        远程存储会下载到本地缓存；fetch 为 False 时只返回缓存路径而不下载
+        """
+
+    @abstractmethod
+    def list_keys(self) -> Iterator[Tuple[str, datetime]]:
+        """列出全部内容寻址对象的 (存储键, 修改时间)，用于清理无引用的对象"""
+
+    def url(self, key: str) -> Optional[str]:
+        """可直接访问对象的短期URL，不支持时返回None"""
+        return None
@@ -0,0 +1,51 @@
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+from utils import signed_media_url
+
+from .base import CONTENT_KEY_PREFIX, StorageBackend, write_file_atomic
+
+
+class LocalStorage(StorageBackend):
+    """本地文件系统存储，对象按存储键保存在根目录下"""
+
+    def __init__(self, root: Union[str, Path]):
+        """
+        :param root: 存储根目录
+        """
+        self.root = Path(root)
+
+    def local_path(self, key: str, fetch: bool = True) -> Path:
+        return self.root / key
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self.local_path(key)
+        # 内容寻址：文件已存在即内容相同，无需重复写入，只刷新修改时间，
+        # 清理（--gc）按修改时间保留宽限期，正在入库的对象不会被删除
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            write_file_atomic(path, data)
+
+    def get(self, key: str) -> bytes:
+        return self.local_path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self.local_path(key).exists()
+
+    def delete(self, key: str) -> None:
+        self.local_path(key).unlink(missing_ok=True)
+
+    def list_keys(self) -> Iterator[Tuple[str, datetime]]:
+        for path in self.root.glob(f"{CONTENT_KEY_PREFIX}*/*/*"):
+            # 跳过写入中的临时文件与缩略图（文件名为 {哈希}_{尺寸}.{扩展名}）
+            if path.name.startswith(".") or "_" in path.stem:
+                continue
+            modified = datetime.fromtimestamp(path.stat().st_mtime)
+            yield path.relative_to(self.root).as_posix(), modified
+
+    def url(self, key: str) -> Optional[str]:
+        # 根目录位于上传目录中时，返回签名URL（可由反向代理直接发送）
+        return signed_media_url(self.local_path(key))
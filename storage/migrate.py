@@ -0,0 +1,190 @@
+"""
+图像存储迁移与清理
+
+用法:
+    python -m storage.migrate [--dry-run] [--keep-originals] [--backend local|s3]
+    python -m storage.migrate --gc [--min-age-hours 24] [--dry-run]
+    python -m storage.migrate --recompress
+    python -m storage.migrate --report
+
+迁移：将 image_path 仍为文件路径的识别记录改为内容寻址的存储键。读取原文件，
+写入配置的存储后端，累加引用计数并更新记录；相同内容只存储一份。
+默认删除迁移完成的原文件及其缩略图，--keep-originals 保留。
+迁移期间运行中的服务可能仍缓存着原文件路径，建议停止服务或使用 --keep-originals。
+
+清理（--gc）：删除存储中没有被任何识别记录引用、且早于 --min-age-hours 的对象
+（识别记录已删除的图像，以及识别失败或请求中断时已写入存储但未入库的图像）。
+再次写入已存在的对象会刷新其修改时间，宽限期应长于单次识别请求的耗时。
+
+入库重压缩（--recompress）：对尚未处理的对象逐个执行入库重压缩（见 RECOMPRESS_CONFIG），
+用于开启重压缩之前上传的图像；新上传的图像由后台任务处理。
+
+统计（--report）：输出对象数、去重与入库重压缩节省的存储空间。
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from database import SessionLocal, init_db
+from eye_identify import remove_thumbnails
+from eye_identify.image_io import parse_image_size
+from models.EyeIdentification import EyeIdentification
+from models.StoredObject import StoredObject
+
+from . import create_storage, get_storage
+from .base import CONTENT_KEY_PREFIX, content_key, is_content_key
+from .recompress import recompress_object, storage_report
+from .references import add_reference, is_referenced
+
+# 图像格式 -> 存储扩展名
+_EXTENSIONS = {"jpeg": ".jpg", "png": ".png"}
+
+
+def migrate(storage, dry_run: bool, keep_originals: bool) -> None:
+    db = SessionLocal()
+    migrated = deduplicated = missing = 0
+    bytes_before = bytes_after = 0
+    keys = set()
+    try:
+        records = (
+            db.query(EyeIdentification)
+            .filter(~EyeIdentification.image_path.startswith(CONTENT_KEY_PREFIX))
+            .order_by(EyeIdentification.id)
+            .all()
+        )
+        for record in records:
+            path = Path(record.image_path)
+            if not path.is_file():
+                missing += 1
+                print(f"[跳过] 记录 {record.id}: 文件不存在 {path}")
+                continue
+
+            data = path.read_bytes()
+            sha256 = hashlib.sha256(data).hexdigest()
+            parsed = parse_image_size(data)
+            extension = _EXTENSIONS[parsed[0]] if parsed else path.suffix
+            key = content_key(sha256, extension)
+
+            bytes_before += len(data)
+            if key in keys or storage.exists(key):
+                deduplicated += 1
+            else:
+                bytes_after += len(data)
+            keys.add(key)
+            migrated += 1
+            if dry_run:
+                continue
+
+            storage.put(key, data)
+            add_reference(db, key, len(data))
+            record.image_path = key
+            db.commit()
+            if not keep_originals:
+                path.unlink(missing_ok=True)
+                remove_thumbnails(path)
+    finally:
+        db.close()
+
+    prefix = "[试运行] " if dry_run else ""
+    print(
+        f"{prefix}迁移 {migrated} 条记录（其中 {deduplicated} 条与已有内容重复），"
+        f"文件缺失 {missing} 条；"
+        f"新增存储 {bytes_after / 1024 / 1024:.1f}MB，"
+        f"去重节省 {(bytes_before - bytes_after) / 1024 / 1024:.1f}MB"
+    )
+
+
+def collect_garbage(storage, min_age_hours: float, dry_run: bool) -> None:
+    db = SessionLocal()
+    deadline = datetime.now() - timedelta(hours=min_age_hours)
+    removed = 0
+    try:
+        for key, modified in storage.list_keys():
+            if not is_content_key(key) or modified > deadline:
+                continue
+            if is_referenced(db, key):
+                continue
+            removed += 1
+            print(f"{'[试运行] ' if dry_run else ''}删除无引用对象 {key}")
+            if not dry_run:
+                remove_thumbnails(storage.local_path(key, fetch=False))
+                storage.delete(key)
+    finally:
+        db.close()
+    print(f"共 {removed} 个无引用对象")
+
+
+def recompress_all(storage) -> None:
+    db = SessionLocal()
+    counts = {}
+    try:
+        keys = [
+            key
+            for (key,) in db.query(StoredObject.key)
+            .filter(StoredObject.processed_at.is_(None))
+            .order_by(StoredObject.created_at)
+        ]
+        for key in keys:
+            try:
+                report = recompress_object(db, storage, key)
+            except ValueError as e:
+                db.rollback()
+                report = {"key": key, "status": "failed"}
+                print(f"[失败] {key}: {e}")
+            counts[report["status"]] = counts.get(report["status"], 0) + 1
+            if report["status"] == "recompressed":
+                print(
+                    f"{key} -> {report['stored_key']}: "
+                    f"{report['original_width']}x{report['original_height']} "
+                    f"{report['original_size'] / 1024:.0f}KB -> "
+                    f"{report['width']}x{report['height']} "
+                    f"{report['stored_size'] / 1024:.0f}KB"
+                )
+    finally:
+        db.close()
+    print(f"共 {len(keys)} 个对象: {counts}")
+
+
+def print_report() -> None:
+    db = SessionLocal()
+    try:
+        report = storage_report(db)
+    finally:
+        db.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图像存储迁移与清理")
+    parser.add_argument("--backend", choices=["local", "s3"], help="默认取配置")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改")
+    parser.add_argument(
+        "--keep-originals", action="store_true", help="迁移后保留原文件"
+    )
+    parser.add_argument("--gc", action="store_true", help="清理无引用的对象")
+    parser.add_argument(
+        "--min-age-hours", type=float, default=24, help="只清理早于该时间的对象"
+    )
+    parser.add_argument(
+        "--recompress", action="store_true", help="入库重压缩尚未处理的对象"
+    )
+    parser.add_argument("--report", action="store_true", help="输出存储统计")
+    args = parser.parse_args()
+
+    init_db()
+    storage = create_storage(args.backend) if args.backend else get_storage()
+    if args.report:
+        print_report()
+    elif args.recompress:
+        recompress_all(storage)
+    elif args.gc:
+        collect_garbage(storage, args.min_age_hours, args.dry_run)
+    else:
+        migrate(storage, args.dry_run, args.keep_originals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from Config import Config
+from eye_identify import recompress_image, submit_thumbnails
+from models.EyeIdentification import EyeIdentification
+from models.StoredObject import StoredObject
+from utils import image_file_cache
+
+from .base import StorageBackend, content_key
+from .references import add_reference
+
+
+def _lock_object(db: Session, key: str):
+    query = db.query(StoredObject).filter(StoredObject.key == key)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update()
+    return query.first()
+
+
+def recompress_object(db: Session, storage: StorageBackend, key: str) -> dict:
+    """
+    入库重压缩：将存储中的原图缩小并重新编码（阻塞操作），返回处理报告
+
+    节省的字节数达到配置比例时，重新编码的图像以新的内容哈希写入存储，
+    引用原图的识别记录全部改为引用新对象，原图及其缩略图随后由清理任务删除；
+    否则保留原图。两种情况都会记录原图的尺寸与字节数，已处理的对象直接跳过。
+    """
+    config = Config.RECOMPRESS_CONFIG
+    report = {"key": key}
+    stored = db.query(StoredObject).filter(StoredObject.key == key).first()
+    if stored is None:
+        # 排队期间识别记录已被删除，或同一原图已由其他任务处理
+        return {**report, "status": "unreferenced"}
+    if stored.processed_at is not None:
+        return {**report, "status": "skipped"}
+
+    path = storage.local_path(key)
+    if not path.exists():
+        return {**report, "status": "missing"}
+    image = recompress_image(
+        path, config["max_side"], config["format"], config["quality"]
+    )
+    original_size = stored.size
+    report.update(
+        original_size=original_size,
+        original_width=image.original_width,
+        original_height=image.original_height,
+    )
+
+    if len(image.data) > original_size * (1 - config["min_savings_ratio"]):
+        # 节省不明显（例如已经是压缩良好的小图），保留原图
+        stored.width, stored.height = image.original_width, image.original_height
+        stored.original_size = original_size
+        stored.original_width = image.original_width
+        stored.original_height = image.original_height
+        stored.processed_at = datetime.now()
+        db.commit()
+        return {**report, "status": "kept", "stored_size": original_size}
+
+    new_key = content_key(hashlib.sha256(image.data).hexdigest(), image.extension)
+    storage.put(new_key, image.data)
+
+    # 锁定原图的引用记录后再迁移引用，与并发的上传、删除互斥
+    stored = _lock_object(db, key)
+    identification_ids = [
+        row.id
+        for row in db.query(EyeIdentification.id).filter(
+            EyeIdentification.image_path == key
+        )
+    ]
+    if stored is None or not identification_ids:
+        # 新写入的对象没有引用，由 python -m storage.migrate --gc 清理
+        db.rollback()
+        return {**report, "status": "unreferenced"}
+
+    db.query(EyeIdentification).filter(EyeIdentification.image_path == key).update(
+        {EyeIdentification.image_path: new_key}, synchronize_session=False
+    )
+    add_reference(db, new_key, len(image.data), len(identification_ids))
+    db.delete(stored)
+    db.flush()
+
+    recompressed = db.query(StoredObject).filter(StoredObject.key == new_key).one()
+    if recompressed.processed_at is None:
+        # 同一原图再次上传时会得到相同的重压缩结果，保留首次记录的原图信息
+        recompressed.width, recompressed.height = image.width, image.height
+        recompressed.original_size = original_size
+        recompressed.original_width = image.original_width
+        recompressed.original_height = image.original_height
+        recompressed.processed_at = datetime.now()
+    db.commit()
+
+    # 本进程缓存的图像文件信息指向原图，需要重新加载。原图不在这里删除：
+    # 相同的原图可能正被并发的上传重新引用，由 python -m storage.migrate --gc 清理
+    for identification_id in identification_ids:
+        image_file_cache.evict(identification_id)
+    submit_thumbnails(storage.local_path(new_key, fetch=False))
+
+    return {
+        **report,
+        "status": "recompressed",
+        "stored_key": new_key,
+        "stored_size": len(image.data),
+        "width": image.width,
+        "height": image.height,
+        "references": len(identification_ids),
+    }
+
+
+def storage_report(db: Session) -> dict:
+    """图像存储统计：对象数、去重与入库重压缩节省的字节数"""
+    processed = StoredObject.processed_at.isnot(None)
+    (
+        objects,
+        stored_bytes,
+        deduplicated_bytes,
+        processed_objects,
+        recompressed_objects,
+        original_bytes,
+        processed_bytes,
+    ) = db.query(
+        func.count(StoredObject.key),
+        func.coalesce(func.sum(StoredObject.size), 0),
+        func.coalesce(func.sum(StoredObject.size * (StoredObject.ref_count - 1)), 0),
+        func.count(StoredObject.processed_at),
+        func.coalesce(
+            func.sum(
+                case((processed & (StoredObject.size < StoredObject.original_size), 1))
+            ),
+            0,
+        ),
+        func.coalesce(func.sum(StoredObject.original_size), 0),
+        func.coalesce(func.sum(case((processed, StoredObject.size))), 0),
+    ).one()
+
+    recompress_saved = original_bytes - processed_bytes
+    return {
+        "objects": objects,
+        "stored_bytes": stored_bytes,
+        # 相同图像被多条识别记录引用而少存储的字节数
+        "deduplicated_bytes": deduplicated_bytes,
+        "recompress": {
+            "enabled": Config.RECOMPRESS_CONFIG["enabled"],
+            "processed_objects": processed_objects,
+            "pending_objects": objects - processed_objects,
+            "recompressed_objects": recompressed_objects,
+            "original_bytes": original_bytes,
+            "stored_bytes": processed_bytes,
+            "saved_bytes": recompress_saved,
+            "saved_ratio": (
+                round(recompress_saved / original_bytes, 4) if original_bytes else 0.0
+            ),
+        },
+    }
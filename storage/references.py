@@ -0,0 +1,57 @@
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.StoredObject import StoredObject
+
+# 支持 INSERT ... ON CONFLICT 的方言
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def add_reference(db: Session, key: str, size: int, count: int = 1) -> None:
+    """
+    增加对象的引用计数，对象不存在时创建（不提交事务）
+
+    与识别记录在同一事务中提交；并发写入相同内容时使用 ON CONFLICT 原子地累加
+    """
+    insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(StoredObject).values(key=key, size=size, ref_count=count)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[StoredObject.key],
+                set_={"ref_count": StoredObject.ref_count + count},
+            )
+        )
+        return
+
+    updated = db.execute(
+        update(StoredObject)
+        .where(StoredObject.key == key)
+        .values(ref_count=StoredObject.ref_count + count)
+    ).rowcount
+    if not updated:
+        db.add(StoredObject(key=key, size=size, ref_count=count))
+        db.flush()
+
+
+def release_reference(db: Session, key: str) -> bool:
+    """
+    减少对象的引用计数（不提交事务），返回引用是否已归零
+
+    引用归零时删除引用记录；调用方应在提交事务之后再删除存储中的对象
+    """
+    db.execute(
+        update(StoredObject)
+        .where(StoredObject.key == key)
+        .values(ref_count=StoredObject.ref_count - 1)
+    )
+    deleted = db.execute(
+        delete(StoredObject).where(StoredObject.key == key, StoredObject.ref_count <= 0)
+    ).rowcount
+    return bool(deleted)
+
+
+def is_referenced(db: Session, key: str) -> bool:
+    """对象是否仍被识别记录引用"""
+    return db.query(StoredObject).filter(StoredObject.key == key).first() is not None
@@ -0,0 +1,107 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+from .base import CONTENT_KEY_PREFIX, StorageBackend, write_file_atomic
+
+
+class S3Storage(StorageBackend):
+    """
+    S3 兼容对象存储（AWS S3、MinIO 等），需要安装 boto3
+
+    解码、Grad-CAM 与缩略图需要本地文件，读取时下载到本地缓存目录；
+    缩略图等派生文件只保存在缓存中，缺失时按需重新生成。
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        cache_dir: Union[str, Path],
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        url_ttl_s: int = 3600,
+        client=None,
+    ):
+        """
+        :param bucket: 存储桶名称
+        :param cache_dir: 本地读取缓存目录
+        :param prefix: 对象键前缀
+        :param endpoint_url: S3 兼容服务地址，如本地的 MinIO
+        :param region: 区域
+        :param url_ttl_s: 预签名URL有效期（秒）
+        :param client: 可选，已创建的 boto3 S3 客户端
+        """
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise ImportError("S3 存储需要安装 boto3: uv sync --extra s3")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = Path(cache_dir)
+        self.url_ttl_s = url_ttl_s
+        self._client = client
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _is_not_found(self, error) -> bool:
+        code = error.response.get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def put(self, key: str, data: bytes) -> None:
+        self._client.put_object(
+            Bucket=self.bucket, Key=self._object_key(key), Body=data
+        )
+        write_file_atomic(self.local_path(key, fetch=False), data)
+
+    def get(self, key: str) -> bytes:
+        cached = self.local_path(key, fetch=False)
+        if cached.exists():
+            return cached.read_bytes()
+        try:
+            response = self._client.get_object(
+                Bucket=self.bucket, Key=self._object_key(key)
+            )
+        except self._client.exceptions.NoSuchKey:
+            raise FileNotFoundError(key)
+        return response["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client.exceptions.ClientError as e:
+            if self._is_not_found(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self.local_path(key, fetch=False).unlink(missing_ok=True)
+
+    def local_path(self, key: str, fetch: bool = True) -> Path:
+        path = self.cache_dir / key
+        if fetch and not path.exists():
+            write_file_atomic(path, self.get(key))
+        return path
+
+    def list_keys(self) -> Iterator[Tuple[str, datetime]]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self.bucket, Prefix=self._object_key(CONTENT_KEY_PREFIX)
+        )
+        for page in pages:
+            for item in page.get("Contents", []):
+                modified = item["LastModified"].astimezone().replace(tzinfo=None)
+                yield item["Key"][len(self.prefix) :], modified
+
+    def url(self, key: str) -> Optional[str]:
+        return self._client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=self.url_ttl_s,
+        )
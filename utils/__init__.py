@@ -1,7 +1,21 @@
-from openai import AsyncOpenAI
-
-from Config import Config
-
+from .body_size_limit import BodySizeLimitMiddleware
 from .get_details_by_disease_name import get_details_by_disease_name
 from .get_disease_suggested_from_model import get_disease_suggested_from_model
+from .image_file_cache import (
+    ImageFileInfo,
+    build_image_file_info,
+    image_file_cache,
+    is_not_modified,
+)
 from .is_valid_comment import is_valid_comment
+from .read_image_upload import (
+    ImageUpload,
+    read_image_upload,
+    read_upload,
+    validate_image_bytes,
+)
+from .signed_media_url import (
+    media_relative_path,
+    signed_media_url,
+    verify_media_signature,
+)
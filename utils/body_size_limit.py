@@ -0,0 +1,29 @@
+# 请求体大小限制中间件
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """
+    按 Content-Length 拒绝过大的请求体
+
+    multipart 表单在进入路由之前就会被完整接收，单个文件的大小检查发生在那之后；
+    在中间件中先检查 Content-Length，过大的上传不必接收完就返回413。
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > self.max_body_size:
+                response = JSONResponse(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    content={"detail": "请求体过大"},
+                    headers={"Connection": "close"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
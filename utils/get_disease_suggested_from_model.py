@@ -1,13 +1,21 @@
-from openai import AsyncOpenAI
+from functools import lru_cache
 
 from Config import Config
 
-if Config.DEEPSEEK_API_KEY is None or Config.DEEPSEEK_API_KEY == "":
-    raise ValueError("请在环境变量中设置 DEEPSEEK_API_KEY")
 
-client = AsyncOpenAI(
-    api_key=Config.DEEPSEEK_API_KEY, base_url="https://api.deepseek.com"
-)
+@lru_cache(maxsize=1)
+def get_client():
+    """
+    首次使用时才创建 DeepSeek 客户端，避免导入时拖慢应用启动
+    """
+    from openai import AsyncOpenAI
+
+    if Config.DEEPSEEK_API_KEY is None or Config.DEEPSEEK_API_KEY == "":
+        raise ValueError("请在环境变量中设置 DEEPSEEK_API_KEY")
+
+    return AsyncOpenAI(
+        api_key=Config.DEEPSEEK_API_KEY, base_url="https://api.deepseek.com"
+    )
 
 
 async def get_disease_suggested_from_model(
@@ -18,7 +26,7 @@ async def get_disease_suggested_from_model(
     """
     从语言模型中获取对应的疾病建议
     """
-    response = await client.chat.completions.create(
+    response = await get_client().chat.completions.create(
         model="deepseek-chat",
         messages=[
             {
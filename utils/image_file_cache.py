@@ -0,0 +1,113 @@
+# 已存储图像的文件信息缓存，用于图像接口的条件请求
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from Config import Config
+
+# 计算文件哈希时的分块大小
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ImageFileInfo:
+    """已存储图像的路径、强ETag（内容SHA-256）与文件状态"""
+
+    path: str
+    etag: str
+    stat_result: os.stat_result
+
+
+def file_sha256(path: str) -> str:
+    """分块计算文件的SHA-256"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def build_image_file_info(path: str, sha256: Optional[str] = None) -> ImageFileInfo:
+    """读取文件状态，未给出内容哈希时计算哈希（阻塞操作，应在线程中执行）"""
+    stat_result = os.stat(path)
+    return ImageFileInfo(
+        path=path,
+        etag=f'"{sha256 or file_sha256(path)}"',
+        stat_result=stat_result,
+    )
+
+
+def is_not_modified(
+    info: ImageFileInfo,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> bool:
+    """
+    判断条件请求是否可以返回304
+
+    有 If-None-Match 时只比较ETag（忽略 If-Modified-Since），
+    否则比较 If-Modified-Since 与文件修改时间（秒级精度）。
+    """
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or info.etag in tags
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(info.stat_result.st_mtime) <= since
+    return False
+
+
+class ImageFileCache:
+    """
+    (识别记录ID, 变体) -> 图像文件信息 的进程内LRU缓存
+
+    变体为None表示原图，否则为缩略图（如 "256.webp"）。存储的图像不会被修改，
+    命中时无需解析存储路径与计算哈希；删除记录时需调用 evict。
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        :param max_entries: 最多缓存的条目数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, ImageFileInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, identification_id: int, variant: Optional[str] = None
+    ) -> Optional[ImageFileInfo]:
+        key = (identification_id, variant)
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+            return info
+
+    def put(
+        self, identification_id: int, info: ImageFileInfo, variant: Optional[str] = None
+    ) -> None:
+        key = (identification_id, variant)
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, identification_id: int) -> None:
+        """删除识别记录原图与全部缩略图的条目"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == identification_id]:
+                del self._entries[key]
+
+
+# 全局图像文件信息缓存
+image_file_cache = ImageFileCache(
+    max_entries=Config.CACHE_CONFIG["image_file_entries"],
+)
@@ -0,0 +1,183 @@
+# 上传图像的流式读取与校验
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from Config import Config
+from eye_identify.image_io import HEADER_READ_BYTES, parse_image_size
+
+# 每次从上传文件读取的字节数
+CHUNK_SIZE = 256 * 1024
+
+# 文件头魔数 -> 图像格式
+_MAGIC_FORMATS = {b"\xff\xd8\xff": "jpeg", b"\x89PNG\r\n\x1a\n": "png"}
+# 图像格式 -> MIME类型
+_FORMAT_TYPES = {"jpeg": "image/jpeg", "png": "image/png"}
+
+
+@dataclass
+class ImageUpload:
+    """读取完成的上传图像"""
+
+    data: bytes
+    sha256: str
+    format: str
+    width: int
+    height: int
+
+
+def _too_large(filename: str, max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{filename} 超过大小上限{max_size // (1024 * 1024)}MB",
+    )
+
+
+def _check_header(
+    filename: str,
+    header: bytes,
+    complete: bool,
+    allowed_types: list,
+    max_pixels: int,
+) -> Optional[tuple]:
+    """
+    校验文件头：魔数必须是允许的图像格式，且能从中读出合理的宽高
+
+    文件头尚不足以判断时返回None，complete 为 True 表示已无更多数据
+    """
+    formats = [
+        fmt
+        for magic, fmt in _MAGIC_FORMATS.items()
+        if header[: len(magic)] == magic[: len(header)]
+    ]
+    if not formats or (
+        complete and not any(header.startswith(m) for m in _MAGIC_FORMATS)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"{filename} 不是JPEG或PNG图像",
+        )
+
+    parsed = parse_image_size(header)
+    if parsed is None:
+        if complete or len(header) >= HEADER_READ_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{filename} 图像头损坏，无法读取尺寸",
+            )
+        return None
+
+    fmt, width, height = parsed
+    if _FORMAT_TYPES[fmt] not in allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"不支持{fmt.upper()}格式的图像",
+        )
+    if width <= 0 or height <= 0 or width * height > max_pixels:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{filename} 图像尺寸{width}x{height}无效或超过上限",
+        )
+    return parsed
+
+
+def validate_image_bytes(
+    filename: str,
+    data: bytes,
+    allowed_types: Optional[list] = None,
+    max_pixels: Optional[int] = None,
+) -> ImageUpload:
+    """
+    校验已在内存中的图像（如zip内的条目），校验规则与 read_image_upload 相同：
+    魔数不符返回415，头损坏或尺寸过大返回400，均在解码之前完成
+    """
+    allowed_types = allowed_types or Config.get_allowed_types()
+    max_pixels = max_pixels or Config.get_max_image_pixels()
+
+    fmt, width, height = _check_header(
+        filename, data[:HEADER_READ_BYTES], True, allowed_types, max_pixels
+    )
+    return ImageUpload(
+        data=data,
+        sha256=hashlib.sha256(data).hexdigest(),
+        format=fmt,
+        width=width,
+        height=height,
+    )
+
+
+async def read_upload(file: UploadFile, max_size: int) -> bytes:
+    """分块读取上传文件，超过 max_size 字节时返回413"""
+    if file.size is not None and file.size > max_size:
+        raise _too_large(file.filename, max_size)
+
+    chunks = []
+    size = 0
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise _too_large(file.filename, max_size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def read_image_upload(
+    file: UploadFile,
+    max_size: Optional[int] = None,
+    allowed_types: Optional[list] = None,
+    max_pixels: Optional[int] = None,
+) -> ImageUpload:
+    """
+    分块读取上传图像，在解码之前完成全部校验：
+
+      - 大小超过上限返回413（已知大小时不读取内容）
+      - 第一个分块即检查魔数与JPEG/PNG头中的宽高，格式不符返回415，头损坏或尺寸过大返回400
+      - 读取的同时增量计算SHA-256
+
+    UploadFile.read 在文件已溢出到磁盘时由线程池执行，不阻塞事件循环
+    """
+    max_size = max_size or Config.get_max_file_size()
+    allowed_types = allowed_types or Config.get_allowed_types()
+    max_pixels = max_pixels or Config.get_max_image_pixels()
+
+    if file.size is not None and file.size > max_size:
+        raise _too_large(file.filename, max_size)
+
+    hasher = hashlib.sha256()
+    chunks = []
+    size = 0
+    parsed = None
+    while chunk := await file.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise _too_large(file.filename, max_size)
+        hasher.update(chunk)
+        chunks.append(chunk)
+        if parsed is None:
+            parsed = _check_header(
+                file.filename,
+                b"".join(chunks)[:HEADER_READ_BYTES],
+                False,
+                allowed_types,
+                max_pixels,
+            )
+
+    if parsed is None:
+        parsed = _check_header(
+            file.filename,
+            b"".join(chunks)[:HEADER_READ_BYTES],
+            True,
+            allowed_types,
+            max_pixels,
+        )
+
+    fmt, width, height = parsed
+    return ImageUpload(
+        data=b"".join(chunks),
+        sha256=hasher.hexdigest(),
+        format=fmt,
+        width=width,
+        height=height,
+    )
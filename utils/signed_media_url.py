@@ -0,0 +1,53 @@
+# 上传目录中文件的HMAC签名URL
+import base64
+import hashlib
+import hmac
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from Config import Config
+
+# 签名URL的路由前缀
+MEDIA_URL_PREFIX = "/api/v1/media/"
+
+
+def _signature(relative_path: str, expires: int) -> str:
+    key = Config.MEDIA_CONFIG["signing_key"].encode("utf-8")
+    message = f"{relative_path}:{expires}".encode("utf-8")
+    digest = hmac.new(key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def media_relative_path(path: Union[str, Path]) -> Optional[str]:
+    """文件相对于上传目录的路径（POSIX格式），不在上传目录中时返回None"""
+    upload_dir = Config.get_upload_dir().resolve()
+    try:
+        return Path(path).resolve().relative_to(upload_dir).as_posix()
+    except ValueError:
+        return None
+
+
+def signed_media_url(
+    path: Union[str, Path], ttl_s: Optional[int] = None
+) -> Optional[str]:
+    """
+    为上传目录中的文件生成签名URL，文件不在上传目录中时返回None
+
+    过期时间按有效期对齐到时间窗口，同一窗口内同一文件的URL保持不变，
+    浏览器缓存不会因为每次签名不同而失效；实际有效期在 ttl_s 与 2*ttl_s 之间。
+    """
+    relative_path = media_relative_path(path)
+    if relative_path is None:
+        return None
+    ttl_s = ttl_s or Config.MEDIA_CONFIG["url_ttl_s"]
+    expires = (int(time.time()) // ttl_s + 2) * ttl_s
+    signature = _signature(relative_path, expires)
+    return f"{MEDIA_URL_PREFIX}{relative_path}?expires={expires}&sig={signature}"
+
+
+def verify_media_signature(relative_path: str, expires: int, signature: str) -> bool:
+    """校验签名与过期时间，只做一次HMAC计算，不访问数据库"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(relative_path, expires), signature)